@@ -4,27 +4,37 @@ FastAPI Backend for Language Teacher Application
 Main application entry point with LLaMA integration for conversation analysis.
 """
 
+import asyncio
+import hashlib
 import logging
 import os
+import re
+import time
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Final, List, Optional
+from uuid import UUID
 
+import aiofiles
+from cachetools import TTLCache
+from email_validator import EmailNotValidError, validate_email
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
 import uvicorn
 
-from app.services.llama_analysis import llama_service, AnalysisResult
-from app.services.gpt_analysis import GPTAnalysisService
-from app.core.config import settings
+from app.services.gpt_analysis import GPTAnalysisService, RateLimiter, close_async_clients
+from app.core.config import settings, get_settings, Settings
 from app.core.database import get_db
 from app.models.user import User
-from app.models.conversation import Conversation, ConversationEvaluation
+from app.models.conversation import Conversation
 from app.schemas.conversation import ConversationCreate, ConversationResponse, AnalysisResponse
 from app.schemas.user import UserCreate, UserResponse
-from app.services.auth import AuthService
+from app.services.auth import auth_service
 from app.services.conversation_service import ConversationService
 
 # Configure logging
@@ -34,66 +44,173 @@ logger = logging.getLogger(__name__)
 # Security
 security = HTTPBearer()
 
-# Services
-auth_service = AuthService()
-conversation_service = ConversationService()
+# Placeholder conversation id returned by the unauthenticated test endpoint
+TEST_CONVERSATION_ID: Final = UUID("550e8400-e29b-41d4-a716-446655440000")
+TEST_CONVERSATION_ID_STR: Final = str(TEST_CONVERSATION_ID)
 
-# Initialize GPT service
-gpt_service = GPTAnalysisService(
-    api_key=settings.OPENAI_API_KEY,
-    model=settings.GPT_MODEL
+# Audio uploads are streamed to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+
+# Accepted audio content types, derived once from ALLOWED_AUDIO_FORMATS
+_AUDIO_MIME_ALIASES = {
+    "mp3": ("audio/mpeg", "audio/mp3"),
+    "wav": ("audio/wav", "audio/x-wav", "audio/wave"),
+}
+ALLOWED_AUDIO_CONTENT_TYPES = frozenset(
+    mime
+    for ext in settings.ALLOWED_AUDIO_FORMATS
+    for mime in _AUDIO_MIME_ALIASES.get(ext, (f"audio/{ext}",))
 )
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+def _sanitize_filename(filename: Optional[str]) -> str:
+    """Strip directory components and unsafe characters from an uploaded filename"""
+    name = os.path.basename(filename or "")
+    return _UNSAFE_FILENAME_CHARS.sub("_", name).lstrip(".") or "audio"
+
+# Authenticated users cached by token digest for a short window
+USER_CACHE_TTL_SECONDS = 30
+_user_cache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+
+# Services
+conversation_service = ConversationService()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     # Startup
     logger.info("Starting Language Teacher Application")
+    settings = get_settings()
+    
+    # Create the upload directory once instead of on every upload
+    app.state.upload_dir = Path(settings.UPLOAD_DIR)
+    app.state.upload_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Analysis services are created here rather than at import time; the
+    # LLaMA service (torch/transformers) is only loaded on first use
+    app.state.llama_service = None
+    app.state.llama_lock = asyncio.Lock()
     if settings.USE_GPT_ANALYSIS and settings.OPENAI_API_KEY:
+        app.state.gpt_service = GPTAnalysisService(
+            api_key=settings.OPENAI_API_KEY,
+            model=settings.GPT_MODEL,
+            fast_model=settings.GPT_FAST_MODEL,
+            json_mode=settings.GPT_JSON_MODE,
+            cache_ttl_seconds=settings.CACHE_TTL_HOURS * 3600 if settings.CACHE_ANALYSIS_RESULTS else None,
+            semantic_cache_threshold=settings.ANALYSIS_SEMANTIC_CACHE_THRESHOLD,
+            rate_limiter=RateLimiter(
+                requests_per_min=settings.OPENAI_REQUESTS_PER_MINUTE,
+                tokens_per_min=settings.OPENAI_TOKENS_PER_MINUTE
+            )
+        )
         logger.info(f"Using GPT model: {settings.GPT_MODEL}")
     else:
-        logger.info(f"Using LLaMA model: {llama_service.model_name}")
+        app.state.gpt_service = None
+        logger.info("Using LLaMA analysis (model loaded on first request)")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Language Teacher Application")
+    if app.state.llama_service is not None:
+        await app.state.llama_service.close()
+    # Pooled OpenAI clients own aiohttp sessions that must be closed explicitly
+    await close_async_clients()
 
 # Create FastAPI app
 app = FastAPI(
     title="Language Teacher API",
     description="AI-powered language learning application with LLaMA conversation analysis",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    # Interactive docs and the OpenAPI schema are only served in debug builds
+    docs_url="/docs" if settings.DEBUG else None,
+    redoc_url="/redoc" if settings.DEBUG else None,
+    openapi_url="/openapi.json" if settings.DEBUG else None
 )
 
-# CORS middleware
+# CORS middleware (explicit lists so browsers can cache preflight responses)
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins for development
-    allow_credentials=False,  # Set to False when allowing all origins
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=settings.CORS_ORIGINS,
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,  # Cache preflight responses for 24 hours
 )
 
-# Dependency to get current user
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+def _load_llama_service():
+    """Import and build the LLaMA service (blocking; loads torch/transformers)"""
+    from app.services.llama_analysis import llama_service
+    return llama_service
+
+async def get_llama():
+    """Get the LLaMA analysis service, building it off the event loop on first use"""
+    if app.state.llama_service is None:
+        # The lock keeps concurrent first requests from loading the model twice
+        async with app.state.llama_lock:
+            if app.state.llama_service is None:
+                app.state.llama_service = await asyncio.to_thread(_load_llama_service)
+    return app.state.llama_service
+
+def _token_cache_key(token: str) -> bytes:
+    """Digest used as the user cache key so raw tokens are not kept in memory"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+def invalidate_cached_user(token: str) -> None:
+    """Drop a token from the user cache (e.g. on logout)"""
+    _user_cache.pop(_token_cache_key(token), None)
+
+async def _resolve_user(token: str) -> User:
+    """Resolve the user for a bearer token, using the short-lived user cache"""
+    cache_key = _token_cache_key(token)
+    
+    cached = _user_cache.get(cache_key)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at is None or expires_at > time.time():
+            return user
+        _user_cache.pop(cache_key, None)
+    
     try:
-        token = credentials.credentials
-        user = await auth_service.get_user_from_token(token)
+        # Decoded once; the same claims give the user and the cache expiry
+        payload = auth_service.verify_token(token)
+        user = auth_service.get_user_from_payload(payload)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-        return user
     except Exception as e:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
+    
+    exp = payload.get("exp")
+    _user_cache[cache_key] = (user, float(exp) if exp is not None else None)
+    return user
+
+# Dependency to get current user
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current authenticated user"""
+    return await _resolve_user(credentials.credentials)
+
+@dataclass
+class AuthContext:
+    """Authenticated user and database session for a request"""
+    user: User
+    db: AsyncSession
+
+async def get_auth_context(
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> AuthContext:
+    """Resolve the current user and database session as a single dependency"""
+    return AuthContext(user=user, db=db)
 
 # Test endpoint for LLaMA analysis (no authentication required)
 @app.post("/api/test/analyze")
 async def test_analyze_conversation(
     transcript: str = Form(...),
     context: Optional[str] = Form(None),
-    audio_duration: Optional[float] = Form(None)
+    audio_duration: Optional[float] = Form(None),
+    settings: Settings = Depends(get_settings)
 ):
     """Test endpoint for LLaMA conversation analysis (no auth required)"""
     try:
@@ -102,14 +219,15 @@ async def test_analyze_conversation(
         # Choose analysis service based on configuration
         if settings.USE_GPT_ANALYSIS and settings.OPENAI_API_KEY:
             logger.info("Using GPT analysis")
-            analysis_result = await gpt_service.analyze_conversation(
+            analysis_result = await app.state.gpt_service.analyze_conversation(
                 transcript=transcript,
                 context=context or "General conversation",
                 audio_duration=audio_duration
             )
         else:
             logger.info("Using LLaMA analysis")
-            analysis_result = await llama_service.analyze_conversation(
+            llama = await get_llama()
+            analysis_result = await llama.analyze_conversation(
                 transcript=transcript,
                 context=context,
                 audio_duration=audio_duration
@@ -118,7 +236,7 @@ async def test_analyze_conversation(
         logger.info(f"Analysis completed successfully")
         
         return {
-            "conversation_id": "550e8400-e29b-41d4-a716-446655440000",  # Valid UUID format
+            "conversation_id": TEST_CONVERSATION_ID_STR,
             "overall_score": analysis_result.overall_score,
             "grammar_score": analysis_result.grammar_score,
             "vocabulary_score": analysis_result.vocabulary_score,
@@ -140,13 +258,22 @@ async def test_analyze_conversation(
 
 # Health check endpoint
 @app.get("/health")
-async def health_check():
+async def health_check(settings: Settings = Depends(get_settings)):
     """Health check endpoint"""
+    # Report the LLaMA service without loading it; the model is built on first analysis
+    if settings.USE_GPT_ANALYSIS and settings.OPENAI_API_KEY:
+        analysis_model, model, device = "GPT", settings.GPT_MODEL, None
+    elif app.state.llama_service is None:
+        analysis_model, model, device = "LLaMA", settings.LLAMA_MODEL_NAME, "not loaded"
+    else:
+        llama = app.state.llama_service
+        analysis_model, model, device = "LLaMA", llama.model_name, llama.device
+    
     return {
         "status": "healthy",
-        "analysis_model": "GPT" if (settings.USE_GPT_ANALYSIS and settings.OPENAI_API_KEY) else "LLaMA",
-        "model": settings.GPT_MODEL if (settings.USE_GPT_ANALYSIS and settings.OPENAI_API_KEY) else llama_service.model_name,
-        "device": llama_service.device,
+        "analysis_model": analysis_model,
+        "model": model,
+        "device": device,
         "version": "1.0.0"
     }
 
@@ -154,9 +281,15 @@ async def health_check():
 @app.post("/api/auth/register", response_model=UserResponse)
 async def register_user(user_data: UserCreate, db=Depends(get_db)):
     """Register a new user"""
+    try:
+        # Full email validation is only needed when an address is first stored
+        validate_email(user_data.email, check_deliverability=False)
+    except EmailNotValidError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         user = await auth_service.create_user(user_data, db)
-        return UserResponse.from_orm(user)
+        return UserResponse.from_orm_trusted(user)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -173,15 +306,14 @@ async def login_user(user_data: UserCreate, db=Depends(get_db)):
 @app.post("/api/conversations", response_model=ConversationResponse)
 async def create_conversation(
     conversation_data: ConversationCreate,
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Create a new conversation"""
     try:
         conversation = await conversation_service.create_conversation(
-            conversation_data, current_user.id, db
+            conversation_data, ctx.user.id, ctx.db
         )
-        return ConversationResponse.from_orm(conversation)
+        return ConversationResponse.from_orm_trusted(conversation)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -191,53 +323,39 @@ async def analyze_conversation(
     transcript: str = Form(...),
     context: Optional[str] = Form(None),
     audio_duration: Optional[float] = Form(None),
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Analyze a conversation using LLaMA"""
     try:
         # Get conversation
-        conversation = await conversation_service.get_conversation(conversation_id, current_user.id, db)
+        conversation = await conversation_service.get_conversation(conversation_id, ctx.user.id, ctx.db)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        # Update conversation with transcript
-        conversation.transcript = transcript
-        conversation.status = "processing"
-        db.commit()
-        
-        # Analyze with LLaMA
+        # Analyze with LLaMA while the transcript/"processing" update is written; only the
+        # update touches the session, so the two can safely overlap
         logger.info(f"Analyzing conversation {conversation_id} with LLaMA")
-        analysis_result = await llama_service.analyze_conversation(
+        llama = await get_llama()
+        analysis_task = asyncio.create_task(llama.analyze_conversation(
             transcript=transcript,
             context=context,
             audio_duration=audio_duration
-        )
+        ))
+        try:
+            await conversation_service.mark_processing(conversation.id, transcript, ctx.db)
+            analysis_result = await analysis_task
+        finally:
+            # A failed write or a disconnected client leaves nobody to read the
+            # analysis, so stop it instead of letting it hold a batch slot
+            if not analysis_task.done():
+                analysis_task.cancel()
         
-        # Save analysis results
-        evaluation = ConversationEvaluation(
-            conversation_id=conversation.id,
-            evaluator_id=current_user.id,
-            overall_score=analysis_result.overall_score,
-            grammar_score=analysis_result.grammar_score,
-            vocabulary_score=analysis_result.vocabulary_score,
-            fluency_score=analysis_result.fluency_score,
-            pronunciation_score=analysis_result.pronunciation_score,
-            comprehension_score=analysis_result.comprehension_score,
-            proficiency_level=analysis_result.proficiency_level,
-            strengths=analysis_result.strengths,
-            areas_for_improvement=analysis_result.areas_for_improvement,
-            recommendations=analysis_result.recommendations,
-            detailed_feedback=analysis_result.detailed_feedback,
-            is_ai_generated=True
+        # Save the evaluation and complete the conversation in a single round trip
+        saved = await conversation_service.finalize_analysis(
+            conversation.id, ctx.user.id, transcript, analysis_result, ctx.db
         )
-        
-        db.add(evaluation)
-        db.commit()
-        
-        # Update conversation status
-        conversation.status = "completed"
-        db.commit()
+        if not saved:
+            raise HTTPException(status_code=404, detail="Conversation not found")
         
         logger.info(f"Analysis completed for conversation {conversation_id}")
         
@@ -258,46 +376,46 @@ async def analyze_conversation(
             vocabulary_analysis=analysis_result.vocabulary_analysis
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing conversation {conversation_id}: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 @app.get("/api/conversations", response_model=List[ConversationResponse])
 async def get_user_conversations(
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Get all conversations for the current user"""
     try:
-        conversations = await conversation_service.get_user_conversations(current_user.id, db)
-        return [ConversationResponse.from_orm(conv) for conv in conversations]
+        # Rows come straight from our own table with the response columns; skip ORM and re-validation
+        conversations = await conversation_service.list_conversations_raw(ctx.user.id, ctx.db)
+        return ORJSONResponse(conversations)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/conversations/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: str,
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Get a specific conversation"""
     try:
-        conversation = await conversation_service.get_conversation(conversation_id, current_user.id, db)
+        conversation = await conversation_service.get_conversation(conversation_id, ctx.user.id, ctx.db)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
-        return ConversationResponse.from_orm(conversation)
+        return ConversationResponse.from_orm_trusted(conversation)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/conversations/{conversation_id}/analysis", response_model=AnalysisResponse)
 async def get_conversation_analysis(
     conversation_id: str,
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Get analysis results for a conversation"""
     try:
-        evaluation = await conversation_service.get_conversation_evaluation(conversation_id, db)
+        evaluation = await conversation_service.get_conversation_evaluation(conversation_id, ctx.db)
         if not evaluation:
             raise HTTPException(status_code=404, detail="Analysis not found")
         
@@ -325,34 +443,48 @@ async def get_conversation_analysis(
 async def upload_audio(
     conversation_id: str,
     audio_file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Upload audio file for conversation"""
     try:
-        # Validate file type
-        if not audio_file.content_type.startswith('audio/'):
-            raise HTTPException(status_code=400, detail="File must be an audio file")
+        # Validate file type (ignore parameters such as "audio/webm;codecs=opus")
+        content_type = (audio_file.content_type or "").split(";", 1)[0].strip().lower()
+        if content_type not in ALLOWED_AUDIO_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported audio format")
         
         # Get conversation
-        conversation = await conversation_service.get_conversation(conversation_id, current_user.id, db)
+        conversation = await conversation_service.get_conversation(conversation_id, ctx.user.id, ctx.db)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Save audio file (simplified - in production, use cloud storage)
-        audio_path = f"uploads/{conversation_id}_{audio_file.filename}"
-        os.makedirs("uploads", exist_ok=True)
+        audio_path = str(app.state.upload_dir / f"{conversation_id}_{_sanitize_filename(audio_file.filename)}")
+        
+        # Stream to disk in bounded chunks instead of buffering the whole file
+        max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        total_bytes = 0
+        async with aiofiles.open(audio_path, "wb") as buffer:
+            while chunk := await audio_file.read(UPLOAD_CHUNK_SIZE):
+                total_bytes += len(chunk)
+                if total_bytes > max_bytes:
+                    break
+                await buffer.write(chunk)
         
-        with open(audio_path, "wb") as buffer:
-            content = await audio_file.read()
-            buffer.write(content)
+        if total_bytes > max_bytes:
+            os.remove(audio_path)
+            raise HTTPException(
+                status_code=413,
+                detail=f"Audio file exceeds {settings.MAX_FILE_SIZE_MB} MB limit"
+            )
         
         # Update conversation with audio file path
         conversation.audio_file_url = audio_path
-        db.commit()
+        await ctx.db.commit()
         
         return {"message": "Audio uploaded successfully", "file_path": audio_path}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -360,15 +492,14 @@ async def upload_audio(
 @app.get("/api/users/{user_id}/progress")
 async def get_user_progress(
     user_id: str,
-    current_user: User = Depends(get_current_user),
-    db=Depends(get_db)
+    ctx: AuthContext = Depends(get_auth_context)
 ):
     """Get user's learning progress"""
     try:
-        if current_user.id != user_id and current_user.role != "teacher":
+        if ctx.user.id != user_id and ctx.user.role != "teacher":
             raise HTTPException(status_code=403, detail="Not authorized")
         
-        progress = await conversation_service.get_user_progress(user_id, db)
+        progress = await conversation_service.get_user_progress(user_id, ctx.db)
         return progress
         
     except Exception as e:
@@ -378,7 +509,7 @@ async def get_user_progress(
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Handle HTTP exceptions"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
     )
@@ -387,7 +518,7 @@ async def http_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """Handle general exceptions"""
     logger.error(f"Unhandled exception: {exc}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"detail": "Internal server error"}
     )
@@ -6,81 +6,17 @@ Data validation and serialization schemas for API requests and responses.
 
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field
 from uuid import UUID
 
-# User Schemas
-class UserBase(BaseModel):
-    """Base user schema"""
-    email: EmailStr
-    username: str = Field(..., min_length=3, max_length=100)
-    first_name: str = Field(..., min_length=1, max_length=100)
-    last_name: str = Field(..., min_length=1, max_length=100)
-    language_preference: str = Field(default="en", max_length=10)
-
-class UserCreate(UserBase):
-    """User creation schema"""
-    password: str = Field(..., min_length=8, max_length=100)
-
-class UserResponse(UserBase):
-    """User response schema"""
-    id: UUID
-    role: str
-    is_active: bool
-    is_verified: bool
-    created_at: datetime
-    last_login: Optional[datetime] = None
-    
-    class Config:
-        from_attributes = True
-
-# Conversation Schemas
-class ConversationBase(BaseModel):
-    """Base conversation schema"""
-    title: str = Field(..., min_length=1, max_length=200)
-    description: Optional[str] = None
-    topic: Optional[str] = Field(None, max_length=100)
-    difficulty_level: str = Field(..., max_length=10)
-    language: str = Field(default="en", max_length=10)
-
-class ConversationCreate(ConversationBase):
-    """Conversation creation schema"""
-    class_id: Optional[UUID] = None
-
-class ConversationResponse(ConversationBase):
-    """Conversation response schema"""
-    id: UUID
-    user_id: UUID
-    class_id: Optional[UUID] = None
-    duration_seconds: Optional[int] = None
-    audio_file_url: Optional[str] = None
-    video_file_url: Optional[str] = None
-    transcript: Optional[str] = None
-    status: str
-    created_at: datetime
-    updated_at: datetime
-    completed_at: Optional[datetime] = None
-    
-    class Config:
-        from_attributes = True
-
-# Analysis Schemas
-class AnalysisResponse(BaseModel):
-    """Analysis response schema"""
-    conversation_id: UUID
-    overall_score: float = Field(..., ge=0, le=100)
-    grammar_score: float = Field(..., ge=0, le=25)
-    vocabulary_score: float = Field(..., ge=0, le=20)
-    fluency_score: float = Field(..., ge=0, le=20)
-    pronunciation_score: float = Field(..., ge=0, le=15)
-    comprehension_score: float = Field(..., ge=0, le=20)
-    proficiency_level: str
-    strengths: List[str]
-    areas_for_improvement: List[str]
-    recommendations: List[str]
-    detailed_feedback: Dict[str, Any]
-    grammar_errors: List[Dict[str, Any]]
-    vocabulary_analysis: List[Dict[str, Any]]
+from ._fields import DurationMinutes, Short10, Text50, Text100, Title200
+from .user import UserBase, UserCreate, UserResponse
+from .conversation import (
+    ConversationBase,
+    ConversationCreate,
+    ConversationResponse,
+    AnalysisResponse
+)
 
 # Progress Schemas
 class ProgressMetrics(BaseModel):
@@ -98,10 +34,10 @@ class ProgressMetrics(BaseModel):
 # Class Schemas
 class ClassBase(BaseModel):
     """Base class schema"""
-    name: str = Field(..., min_length=1, max_length=200)
+    name: Title200
     description: Optional[str] = None
-    language: str = Field(..., max_length=10)
-    level: str = Field(..., max_length=10)
+    language: Short10
+    level: Short10
     max_students: int = Field(default=30, ge=1, le=100)
 
 class ClassCreate(ClassBase):
@@ -122,12 +58,12 @@ class ClassResponse(ClassBase):
 # Assignment Schemas
 class AssignmentBase(BaseModel):
     """Base assignment schema"""
-    title: str = Field(..., min_length=1, max_length=200)
+    title: Title200
     description: str
     instructions: str
-    topic: Optional[str] = Field(None, max_length=100)
-    difficulty_level: str = Field(..., max_length=10)
-    duration_minutes: Optional[int] = Field(None, ge=1, le=120)
+    topic: Optional[Text100] = None
+    difficulty_level: Short10
+    duration_minutes: Optional[DurationMinutes] = None
     due_date: Optional[datetime] = None
 
 class AssignmentCreate(AssignmentBase):
@@ -149,12 +85,12 @@ class AssignmentResponse(AssignmentBase):
 # Achievement Schemas
 class AchievementBase(BaseModel):
     """Base achievement schema"""
-    name: str = Field(..., min_length=1, max_length=200)
+    name: Title200
     description: str
     icon_url: Optional[str] = None
     criteria: Dict[str, Any]
     points: int = Field(default=0, ge=0)
-    category: Optional[str] = Field(None, max_length=100)
+    category: Optional[Text100] = None
 
 class AchievementResponse(AchievementBase):
     """Achievement response schema"""
@@ -179,10 +115,10 @@ class UserAchievementResponse(BaseModel):
 # Practice Session Schemas
 class PracticeSessionBase(BaseModel):
     """Base practice session schema"""
-    session_type: str = Field(..., max_length=50)
-    topic: Optional[str] = Field(None, max_length=100)
-    difficulty_level: Optional[str] = Field(None, max_length=10)
-    duration_minutes: Optional[int] = Field(None, ge=1, le=120)
+    session_type: Text50
+    topic: Optional[Text100] = None
+    difficulty_level: Optional[Short10] = None
+    duration_minutes: Optional[DurationMinutes] = None
 
 class PracticeSessionCreate(PracticeSessionBase):
     """Practice session creation schema"""
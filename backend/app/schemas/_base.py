@@ -0,0 +1,22 @@
+"""
+Schema Base Helpers
+
+Shared behaviour for response schemas built from ORM objects.
+"""
+
+from typing import Any
+
+class TrustedORMMixin:
+    """Construct response schemas from ORM objects without re-validation"""
+    
+    @classmethod
+    def from_orm_trusted(cls, obj: Any):
+        """
+        Build the schema from an ORM object loaded from our own database.
+        
+        Validation is skipped (model_construct), so only use this for rows we
+        wrote ourselves -- never for client-supplied data.
+        """
+        return cls.model_construct(
+            **{name: getattr(obj, name) for name in cls.model_fields}
+        )
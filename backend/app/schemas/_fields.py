@@ -0,0 +1,27 @@
+"""
+Shared Field Types
+
+Reusable constrained field aliases so identical constraints are declared once.
+"""
+
+import re
+from typing import Annotated
+from pydantic import Field
+
+# Cheap well-formedness check; full RFC validation only runs at registration
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Strings
+Title200 = Annotated[str, Field(min_length=1, max_length=200)]
+Name100 = Annotated[str, Field(min_length=1, max_length=100)]
+Text100 = Annotated[str, Field(max_length=100)]
+Text50 = Annotated[str, Field(max_length=50)]
+Short10 = Annotated[str, Field(max_length=10)]
+
+# Credentials
+Email = Annotated[str, Field(pattern=EMAIL_PATTERN.pattern, max_length=254)]
+Username = Annotated[str, Field(min_length=3, max_length=100)]
+Password = Annotated[str, Field(min_length=8, max_length=100)]
+
+# Numbers
+DurationMinutes = Annotated[int, Field(ge=1, le=120)]
@@ -6,22 +6,25 @@ Pydantic schemas for conversation-related data validation and serialization.
 
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, SkipValidation
 from uuid import UUID
 
+from ._base import TrustedORMMixin
+from ._fields import Short10, Text100, Title200
+
 class ConversationBase(BaseModel):
     """Base conversation schema"""
-    title: str = Field(..., min_length=1, max_length=200)
+    title: Title200
     description: Optional[str] = None
-    topic: Optional[str] = Field(None, max_length=100)
-    difficulty_level: str = Field(..., max_length=10)
-    language: str = Field(default="en", max_length=10)
+    topic: Optional[Text100] = None
+    difficulty_level: Short10
+    language: Short10 = "en"
 
 class ConversationCreate(ConversationBase):
     """Conversation creation schema"""
     class_id: Optional[UUID] = None
 
-class ConversationResponse(ConversationBase):
+class ConversationResponse(ConversationBase, TrustedORMMixin):
     """Conversation response schema"""
     id: UUID
     user_id: UUID
@@ -51,6 +54,7 @@ class AnalysisResponse(BaseModel):
     strengths: List[str]
     areas_for_improvement: List[str]
     recommendations: List[str]
-    detailed_feedback: Dict[str, Any]
-    grammar_errors: List[Dict[str, Any]]
-    vocabulary_analysis: List[Dict[str, Any]]
+    # Free-form payloads produced by our analysis services; passed through without a recursive validation walk
+    detailed_feedback: SkipValidation[Dict[str, Any]]
+    grammar_errors: SkipValidation[List[Dict[str, Any]]]
+    vocabulary_analysis: SkipValidation[List[Dict[str, Any]]]
@@ -6,22 +6,25 @@ Pydantic schemas for user-related data validation and serialization.
 
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel
 from uuid import UUID
 
+from ._base import TrustedORMMixin
+from ._fields import Email, Name100, Password, Short10, Username
+
 class UserBase(BaseModel):
     """Base user schema"""
-    email: EmailStr
-    username: str = Field(..., min_length=3, max_length=100)
-    first_name: str = Field(..., min_length=1, max_length=100)
-    last_name: str = Field(..., min_length=1, max_length=100)
-    language_preference: str = Field(default="en", max_length=10)
+    email: Email
+    username: Username
+    first_name: Name100
+    last_name: Name100
+    language_preference: Short10 = "en"
 
 class UserCreate(UserBase):
     """User creation schema"""
-    password: str = Field(..., min_length=8, max_length=100)
+    password: Password
 
-class UserResponse(UserBase):
+class UserResponse(UserBase, TrustedORMMixin):
     """User response schema"""
     id: UUID
     role: str
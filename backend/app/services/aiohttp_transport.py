@@ -0,0 +1,75 @@
+"""
+aiohttp Transport for httpx
+
+httpx transport that sends requests through a shared aiohttp session, used by
+the OpenAI client so many concurrent analyses don't serialize on httpx's pool.
+"""
+
+import asyncio
+from typing import Optional
+
+import aiohttp
+import httpx
+
+class _AiohttpResponseStream(httpx.AsyncByteStream):
+    """Response body streamed straight from the aiohttp connection"""
+
+    def __init__(self, response: aiohttp.ClientResponse):
+        self._response = response
+
+    async def __aiter__(self):
+        async for chunk in self._response.content.iter_any():
+            yield chunk
+
+    async def aclose(self) -> None:
+        self._response.release()
+
+class AioHTTPTransport(httpx.AsyncBaseTransport):
+    """httpx transport delegating to an aiohttp.ClientSession"""
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 100):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host),
+                # httpx decodes Content-Encoding itself based on the response headers
+                auto_decompress=False
+            )
+        return self._session
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        timeout = request.extensions.get("timeout", {})
+        try:
+            response = await self._get_session().request(
+                request.method,
+                str(request.url),
+                # aiohttp's CIMultiDict only takes str keys, not httpx's raw byte pairs
+                headers=list(request.headers.multi_items()),
+                data=await request.aread(),
+                allow_redirects=False,
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=timeout.get("connect"),
+                    sock_read=timeout.get("read")
+                )
+            )
+        except asyncio.TimeoutError as e:
+            raise httpx.ReadTimeout(str(e), request=request) from e
+        except aiohttp.ClientError as e:
+            raise httpx.ConnectError(str(e), request=request) from e
+
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.raw_headers,
+            stream=_AiohttpResponseStream(response),
+            request=request
+        )
+
+    async def aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -4,13 +4,25 @@ Authentication Service
 JWT-based authentication service for user management.
 """
 
+import asyncio
+import base64
+import hashlib
+import hmac
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+import bcrypt
+import orjson
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TTLCache
+import jwt
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import insert, select, or_
 
 from app.core.config import settings
 from app.models.user import User
@@ -18,90 +30,190 @@ from app.schemas.user import UserCreate
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Token and hashing parameters, read from settings once at import
+SECRET_KEY = settings.JWT_SECRET_KEY
+ALGORITHM = settings.JWT_ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
+REFRESH_TOKEN_EXPIRE_DAYS = settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS
+PASSWORD_HASH_SCHEME = settings.PASSWORD_HASH_SCHEME
+BCRYPT_COST = settings.BCRYPT_COST
+ACCESS_TOKEN_TTL_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+REFRESH_TOKEN_TTL_SECONDS = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+
+# bcrypt only looks at the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# Argon2id for new hashes; bcrypt hashes are still accepted and upgraded on login
+_argon2_hasher = PasswordHasher(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST,
+    parallelism=settings.ARGON2_PARALLELISM
+)
+_ARGON2_PREFIX = "$argon2"
+
+# Password hashing is CPU-bound and releases the GIL, so run it off the event loop
+_HASH_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="password-hash")
+
+# Recently verified token payloads, keyed by SHA-256 of the token
+VERIFIED_TOKEN_CACHE_TTL_SECONDS = 5
+_verified_tokens: TTLCache = TTLCache(maxsize=10_000, ttl=VERIFIED_TOKEN_CACHE_TTL_SECONDS)
+
+# HMAC algorithms whose tokens are minted locally from a precomputed header
+_HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url, as used by JWS"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def _load_asymmetric_keys():
+    """Parse the PEM key pair once so PyJWT reuses the key objects on every call"""
+    from cryptography.hazmat.primitives.serialization import (
+        load_pem_private_key,
+        load_pem_public_key,
+    )
+    
+    private_key = None
+    if settings.JWT_PRIVATE_KEY:
+        pem = settings.JWT_PRIVATE_KEY.replace("\\n", "\n").encode("utf-8")
+        private_key = load_pem_private_key(pem, password=None)
+    
+    if settings.JWT_PUBLIC_KEY:
+        pem = settings.JWT_PUBLIC_KEY.replace("\\n", "\n").encode("utf-8")
+        public_key = load_pem_public_key(pem)
+    elif private_key is not None:
+        public_key = private_key.public_key()
+    else:
+        raise ValueError(f"JWT_PUBLIC_KEY or JWT_PRIVATE_KEY is required for {ALGORITHM}")
+    
+    return private_key, public_key
+
+_HMAC_DIGEST = _HMAC_DIGESTS.get(ALGORITHM)
+if _HMAC_DIGEST is not None:
+    # Keyed once; each signature starts from a copy instead of re-running the key schedule
+    _HMAC_TEMPLATE = hmac.new(SECRET_KEY.encode("utf-8"), digestmod=_HMAC_DIGEST)
+    _SIGNING_KEY = _VERIFYING_KEY = SECRET_KEY
+else:
+    # Asymmetric algorithms such as EdDSA (Ed25519)
+    _HMAC_TEMPLATE = None
+    _SIGNING_KEY, _VERIFYING_KEY = _load_asymmetric_keys()
+
+_JWT_HEADER_B64 = _b64url(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
+
+def _encode_token(claims: dict) -> str:
+    """Sign claims, reusing the encoded header and keyed HMAC for HMAC algorithms"""
+    if _HMAC_TEMPLATE is None:
+        return jwt.encode(claims, _SIGNING_KEY, algorithm=ALGORITHM)
+    
+    signing_input = _JWT_HEADER_B64 + b"." + _b64url(orjson.dumps(claims))
+    mac = _HMAC_TEMPLATE.copy()
+    mac.update(signing_input)
+    return (signing_input + b"." + _b64url(mac.digest())).decode("ascii")
+
+def _password_bytes(password: str) -> bytes:
+    """Encode a password the way bcrypt will actually use it"""
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
 
 class AuthService:
     """Authentication service"""
     
-    def __init__(self):
-        self.secret_key = settings.JWT_SECRET_KEY
-        self.algorithm = settings.JWT_ALGORITHM
-        self.access_token_expire_minutes = settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
-        self.refresh_token_expire_days = settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS
-    
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+        """Verify a password against its Argon2 or bcrypt hash"""
+        if hashed_password.startswith(_ARGON2_PREFIX):
+            try:
+                return _argon2_hasher.verify(hashed_password, plain_password)
+            except (VerificationError, InvalidHashError):
+                return False
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
     
     def get_password_hash(self, password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+        """Hash a password with the configured scheme"""
+        if PASSWORD_HASH_SCHEME == "argon2":
+            return _argon2_hasher.hash(password)
+        salt = bcrypt.gensalt(rounds=BCRYPT_COST)
+        return bcrypt.hashpw(_password_bytes(password), salt).decode("utf-8")
+    
+    def password_needs_rehash(self, hashed_password: str) -> bool:
+        """Whether a stored hash uses a different scheme or cost than configured"""
+        is_argon2 = hashed_password.startswith(_ARGON2_PREFIX)
+        if PASSWORD_HASH_SCHEME == "argon2":
+            return not is_argon2 or _argon2_hasher.check_needs_rehash(hashed_password)
+        # bcrypt hashes look like $2b$<cost>$...
+        return is_argon2 or hashed_password[4:6] != f"{BCRYPT_COST:02d}"
     
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token"""
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=self.access_token_expire_minutes)
-        
-        to_encode.update({"exp": expire, "type": "access"})
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
-        return encoded_jwt
+        ttl = int(expires_delta.total_seconds()) if expires_delta else ACCESS_TOKEN_TTL_SECONDS
+        to_encode = {**data, "exp": int(time.time()) + ttl, "type": "access"}
+        return _encode_token(to_encode)
     
     def create_refresh_token(self, data: dict) -> str:
         """Create JWT refresh token"""
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=self.refresh_token_expire_days)
-        to_encode.update({"exp": expire, "type": "refresh"})
-        encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
-        return encoded_jwt
+        to_encode = {**data, "exp": int(time.time()) + REFRESH_TOKEN_TTL_SECONDS, "type": "refresh"}
+        return _encode_token(to_encode)
     
     def verify_token(self, token: str) -> Optional[dict]:
         """Verify and decode JWT token"""
+        cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+        cached = _verified_tokens.get(cache_key)
+        if cached is not None:
+            if cached.get("exp", 0) > time.time():
+                return cached
+            _verified_tokens.pop(cache_key, None)
+        
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+            payload = jwt.decode(
+                token,
+                _VERIFYING_KEY,
+                algorithms=[ALGORITHM],
+                options={"require": ["exp", "type"]}
+            )
+            # Failures are never cached, so a bad token is always re-checked
+            _verified_tokens[cache_key] = payload
             return payload
-        except JWTError as e:
+        except jwt.PyJWTError as e:
             logger.warning(f"JWT verification failed: {e}")
             return None
     
     async def create_user(self, user_data: UserCreate, db: Session) -> User:
         """Create a new user"""
         try:
-            # Check if user already exists
-            existing_user = await db.execute(
-                select(User).where(User.email == user_data.email)
+            # Check email and username uniqueness in a single round trip
+            existing = await db.execute(
+                select(User.email, User.username).where(
+                    or_(User.email == user_data.email, User.username == user_data.username)
+                )
             )
-            if existing_user.scalar_one_or_none():
+            rows = existing.all()
+            if any(row.email == user_data.email for row in rows):
                 raise ValueError("User with this email already exists")
-            
-            existing_username = await db.execute(
-                select(User).where(User.username == user_data.username)
-            )
-            if existing_username.scalar_one_or_none():
+            if rows:
                 raise ValueError("Username already taken")
             
             # Create new user
-            hashed_password = self.get_password_hash(user_data.password)
-            user = User(
-                email=user_data.email,
-                username=user_data.username,
-                password_hash=hashed_password,
-                first_name=user_data.first_name,
-                last_name=user_data.last_name,
-                language_preference=user_data.language_preference
+            loop = asyncio.get_running_loop()
+            hashed_password = await loop.run_in_executor(
+                _HASH_POOL, self.get_password_hash, user_data.password
             )
-            
-            db.add(user)
+            # INSERT ... RETURNING loads server defaults (id, timestamps) without a refresh
+            result = await db.execute(
+                insert(User)
+                .values(
+                    email=user_data.email,
+                    username=user_data.username,
+                    password_hash=hashed_password,
+                    first_name=user_data.first_name,
+                    last_name=user_data.last_name,
+                    language_preference=user_data.language_preference
+                )
+                .returning(User)
+            )
+            user = result.scalar_one()
             await db.commit()
-            await db.refresh(user)
             
             logger.info(f"Created new user: {user.email}")
             return user
             
-        except Exception as e:
+        except (SQLAlchemyError, ValueError) as e:
             await db.rollback()
             logger.error(f"Error creating user: {e}")
             raise
@@ -120,9 +232,19 @@ class AuthService:
                 raise ValueError("User account is disabled")
             
             # Verify password
-            if not self.verify_password(password, user.password_hash):
+            loop = asyncio.get_running_loop()
+            password_ok = await loop.run_in_executor(
+                _HASH_POOL, self.verify_password, password, user.password_hash
+            )
+            if not password_ok:
                 raise ValueError("Invalid email or password")
             
+            # Upgrade legacy or outdated hashes while the plaintext is available
+            if self.password_needs_rehash(user.password_hash):
+                user.password_hash = await loop.run_in_executor(
+                    _HASH_POOL, self.get_password_hash, password
+                )
+            
             # Update last login
             user.last_login = datetime.utcnow()
             await db.commit()
@@ -138,14 +260,17 @@ class AuthService:
             logger.info(f"User authenticated: {user.email}")
             return access_token
             
-        except Exception as e:
+        except (SQLAlchemyError, ValueError) as e:
             logger.error(f"Authentication error: {e}")
             raise
     
     async def get_user_from_token(self, token: str) -> Optional[User]:
         """Get user from JWT token"""
+        return self.get_user_from_payload(self.verify_token(token))
+    
+    def get_user_from_payload(self, payload: Optional[dict]) -> Optional[User]:
+        """Get user from the claims of an already-verified access token"""
         try:
-            payload = self.verify_token(token)
             if not payload or payload.get("type") != "access":
                 return None
             
@@ -189,3 +314,6 @@ class AuthService:
         except Exception as e:
             logger.error(f"Error refreshing token: {e}")
             return None
+
+# Global instance
+auth_service = AuthService()
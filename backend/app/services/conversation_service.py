@@ -6,17 +6,33 @@ Business logic for conversation management and analysis.
 
 import logging
 from datetime import datetime
+import numpy as np
 from typing import List, Optional, Dict, Any
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, func, desc, insert, update, delete, true
 from uuid import UUID
 
 from app.models.conversation import Conversation, ConversationEvaluation
 from app.models.user import User
-from app.schemas.conversation import ConversationCreate
+from app.schemas.conversation import ConversationCreate, ConversationResponse
 
 logger = logging.getLogger(__name__)
 
+# Columns selected for read-only list endpoints (kept in sync with the response schema)
+CONVERSATION_LIST_COLUMNS = tuple(
+    getattr(Conversation, name) for name in ConversationResponse.model_fields
+)
+
+# Per-skill scores returned in the progress trend, in response order
+TREND_SCORE_COLUMNS = (
+    ConversationEvaluation.grammar_score,
+    ConversationEvaluation.vocabulary_score,
+    ConversationEvaluation.fluency_score,
+    ConversationEvaluation.pronunciation_score,
+    ConversationEvaluation.comprehension_score,
+)
+
 class ConversationService:
     """Conversation service"""
     
@@ -28,24 +44,27 @@ class ConversationService:
     ) -> Conversation:
         """Create a new conversation"""
         try:
-            conversation = Conversation(
-                user_id=user_id,
-                class_id=conversation_data.class_id,
-                title=conversation_data.title,
-                description=conversation_data.description,
-                topic=conversation_data.topic,
-                difficulty_level=conversation_data.difficulty_level,
-                language=conversation_data.language
+            # INSERT ... RETURNING loads server defaults (id, status, timestamps) without a refresh
+            result = await db.execute(
+                insert(Conversation)
+                .values(
+                    user_id=user_id,
+                    class_id=conversation_data.class_id,
+                    title=conversation_data.title,
+                    description=conversation_data.description,
+                    topic=conversation_data.topic,
+                    difficulty_level=conversation_data.difficulty_level,
+                    language=conversation_data.language
+                )
+                .returning(Conversation)
             )
-            
-            db.add(conversation)
+            conversation = result.scalar_one()
             await db.commit()
-            await db.refresh(conversation)
             
             logger.info(f"Created conversation: {conversation.id}")
             return conversation
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             await db.rollback()
             logger.error(f"Error creating conversation: {e}")
             raise
@@ -58,15 +77,14 @@ class ConversationService:
     ) -> Optional[Conversation]:
         """Get a conversation by ID"""
         try:
-            result = await db.execute(
-                select(Conversation).where(
-                    Conversation.id == conversation_id,
-                    Conversation.user_id == user_id
-                )
-            )
-            return result.scalar_one_or_none()
+            # Primary-key lookup: served from the identity map when already loaded
+            conversation = await db.get(Conversation, conversation_id)
+            # Callers pass the token subject, a str, while the column holds a UUID
+            if conversation is None or str(conversation.user_id) != str(user_id):
+                return None
+            return conversation
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error getting conversation: {e}")
             return None
     
@@ -84,10 +102,28 @@ class ConversationService:
             )
             return result.scalars().all()
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error getting user conversations: {e}")
             return []
     
+    async def list_conversations_raw(
+        self, 
+        user_id: UUID, 
+        db: Session
+    ) -> List[Dict[str, Any]]:
+        """Get all conversations for a user as plain column mappings (no ORM objects)"""
+        try:
+            result = await db.execute(
+                select(*CONVERSATION_LIST_COLUMNS)
+                .where(Conversation.user_id == user_id)
+                .order_by(desc(Conversation.created_at))
+            )
+            return [dict(row) for row in result.mappings().all()]
+            
+        except SQLAlchemyError as e:
+            logger.error(f"Error listing user conversations: {e}")
+            return []
+    
     async def get_conversation_evaluation(
         self, 
         conversation_id: UUID, 
@@ -102,10 +138,91 @@ class ConversationService:
             )
             return result.scalar_one_or_none()
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error getting conversation evaluation: {e}")
             return None
     
+    async def mark_processing(
+        self, 
+        conversation_id: UUID, 
+        transcript: str, 
+        db: Session
+    ) -> None:
+        """Store the transcript and flag the conversation as being analyzed"""
+        try:
+            await db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(transcript=transcript, status="processing")
+            )
+            await db.commit()
+            
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error marking conversation as processing: {e}")
+            raise
+    
+    async def finalize_analysis(
+        self, 
+        conversation_id: UUID, 
+        user_id: UUID, 
+        transcript: str, 
+        analysis_result: Any, 
+        db: Session
+    ) -> bool:
+        """Store an AI evaluation and mark the conversation completed in one statement"""
+        try:
+            evaluation_cte = (
+                insert(ConversationEvaluation)
+                .values(
+                    conversation_id=conversation_id,
+                    evaluator_id=user_id,
+                    overall_score=analysis_result.overall_score,
+                    grammar_score=analysis_result.grammar_score,
+                    vocabulary_score=analysis_result.vocabulary_score,
+                    fluency_score=analysis_result.fluency_score,
+                    pronunciation_score=analysis_result.pronunciation_score,
+                    comprehension_score=analysis_result.comprehension_score,
+                    proficiency_level=analysis_result.proficiency_level,
+                    strengths=analysis_result.strengths,
+                    areas_for_improvement=analysis_result.areas_for_improvement,
+                    recommendations=analysis_result.recommendations,
+                    detailed_feedback=analysis_result.detailed_feedback,
+                    is_ai_generated=True
+                )
+                .returning(ConversationEvaluation.id)
+                .cte("new_evaluation")
+            )
+            
+            # WITH new_evaluation AS (INSERT ... RETURNING id) UPDATE conversations ... RETURNING id
+            stmt = (
+                update(Conversation)
+                .where(
+                    Conversation.id == conversation_id,
+                    Conversation.user_id == user_id
+                )
+                .values(
+                    transcript=transcript,
+                    status="completed",
+                    completed_at=datetime.utcnow()
+                )
+                .returning(Conversation.id)
+                .add_cte(evaluation_cte)
+            )
+            
+            result = await db.execute(stmt)
+            if result.first() is None:
+                await db.rollback()
+                return False
+            
+            await db.commit()
+            return True
+            
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Error finalizing analysis: {e}")
+            raise
+    
     async def get_user_progress(
         self, 
         user_id: UUID, 
@@ -113,62 +230,72 @@ class ConversationService:
     ) -> Dict[str, Any]:
         """Get user's learning progress"""
         try:
-            # Get total conversations
-            total_conversations_result = await db.execute(
-                select(func.count(Conversation.id)).where(Conversation.user_id == user_id)
-            )
-            total_conversations = total_conversations_result.scalar() or 0
+            # All progress figures are fetched in one round trip: the summary
+            # values are aggregates and scalar subqueries, and the recent evaluations are
+            # LEFT JOINed on so a user with no evaluations still gets one row
+            def user_evaluations(*columns):
+                return select(*columns).join(Conversation).where(Conversation.user_id == user_id)
             
-            # Get average score
-            avg_score_result = await db.execute(
-                select(func.avg(ConversationEvaluation.overall_score))
-                .join(Conversation)
+            conversation_totals = (
+                select(
+                    func.count(Conversation.id).label("total_conversations"),
+                    func.max(Conversation.created_at).label("last_conversation_date")
+                )
                 .where(Conversation.user_id == user_id)
+                .subquery("conversation_totals")
             )
-            average_score = avg_score_result.scalar() or 0.0
             
-            # Get current level (latest evaluation)
-            latest_evaluation_result = await db.execute(
-                select(ConversationEvaluation.proficiency_level)
-                .join(Conversation)
-                .where(Conversation.user_id == user_id)
+            summary = select(
+                conversation_totals.c.total_conversations,
+                conversation_totals.c.last_conversation_date,
+                user_evaluations(func.avg(ConversationEvaluation.overall_score))
+                .scalar_subquery()
+                .label("average_score"),
+                user_evaluations(ConversationEvaluation.proficiency_level)
                 .order_by(desc(ConversationEvaluation.created_at))
                 .limit(1)
-            )
-            current_level = latest_evaluation_result.scalar() or "A1"
-            
-            # Get last conversation date
-            last_conversation_result = await db.execute(
-                select(Conversation.created_at)
-                .where(Conversation.user_id == user_id)
-                .order_by(desc(Conversation.created_at))
-                .limit(1)
-            )
-            last_conversation_date = last_conversation_result.scalar()
+                .scalar_subquery()
+                .label("current_level")
+            ).subquery("summary")
             
-            # Get trend data (last 10 conversations)
-            trend_evaluations_result = await db.execute(
-                select(
-                    ConversationEvaluation.grammar_score,
-                    ConversationEvaluation.vocabulary_score,
-                    ConversationEvaluation.fluency_score,
-                    ConversationEvaluation.pronunciation_score,
-                    ConversationEvaluation.comprehension_score
+            # Trend data (last 10 evaluations)
+            trend = (
+                user_evaluations(
+                    ConversationEvaluation.id.label("evaluation_id"),
+                    ConversationEvaluation.created_at.label("evaluated_at"),
+                    *TREND_SCORE_COLUMNS
                 )
-                .join(Conversation)
-                .where(Conversation.user_id == user_id)
                 .order_by(desc(ConversationEvaluation.created_at))
                 .limit(10)
+                .subquery("trend")
+            )
+            
+            progress_result = await db.execute(
+                select(*summary.c, *trend.c)
+                .select_from(summary.outerjoin(trend, true()))
+                .order_by(desc(trend.c.evaluated_at))
             )
+            rows = progress_result.all()
             
-            trend_data = trend_evaluations_result.all()
+            total_conversations = rows[0].total_conversations or 0
+            average_score = rows[0].average_score or 0.0
+            current_level = rows[0].current_level or "A1"
+            last_conversation_date = rows[0].last_conversation_date
+            trend_data = [
+                tuple(row)[-len(TREND_SCORE_COLUMNS):]
+                for row in rows
+                if row.evaluation_id is not None
+            ]
             
-            # Extract trend arrays
-            grammar_trend = [eval.grammar_score for eval in trend_data]
-            vocabulary_trend = [eval.vocabulary_score for eval in trend_data]
-            fluency_trend = [eval.fluency_score for eval in trend_data]
-            pronunciation_trend = [eval.pronunciation_score for eval in trend_data]
-            comprehension_trend = [eval.comprehension_score for eval in trend_data]
+            # Extract trend arrays (one column per score)
+            trend_scores = np.array(trend_data, dtype=np.float64).reshape(-1, len(TREND_SCORE_COLUMNS))
+            (
+                grammar_trend,
+                vocabulary_trend,
+                fluency_trend,
+                pronunciation_trend,
+                comprehension_trend
+            ) = trend_scores.T.tolist()
             
             return {
                 "total_conversations": total_conversations,
@@ -182,7 +309,7 @@ class ConversationService:
                 "comprehension_trend": comprehension_trend
             }
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             logger.error(f"Error getting user progress: {e}")
             return {
                 "total_conversations": 0,
@@ -204,22 +331,24 @@ class ConversationService:
     ) -> bool:
         """Update conversation status"""
         try:
+            values = {"status": status}
+            if status == "completed":
+                values["completed_at"] = datetime.utcnow()
+            
             result = await db.execute(
-                select(Conversation).where(Conversation.id == conversation_id)
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(**values)
+                .returning(Conversation.id)
             )
-            conversation = result.scalar_one_or_none()
-            
-            if not conversation:
+            if result.first() is None:
+                await db.rollback()
                 return False
             
-            conversation.status = status
-            if status == "completed":
-                conversation.completed_at = datetime.utcnow()
-            
             await db.commit()
             return True
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             await db.rollback()
             logger.error(f"Error updating conversation status: {e}")
             return False
@@ -233,23 +362,23 @@ class ConversationService:
         """Delete a conversation"""
         try:
             result = await db.execute(
-                select(Conversation).where(
+                delete(Conversation)
+                .where(
                     Conversation.id == conversation_id,
                     Conversation.user_id == user_id
                 )
+                .returning(Conversation.id)
             )
-            conversation = result.scalar_one_or_none()
-            
-            if not conversation:
+            if result.first() is None:
+                await db.rollback()
                 return False
             
-            await db.delete(conversation)
             await db.commit()
             
             logger.info(f"Deleted conversation: {conversation_id}")
             return True
             
-        except Exception as e:
+        except SQLAlchemyError as e:
             await db.rollback()
             logger.error(f"Error deleting conversation: {e}")
             return False
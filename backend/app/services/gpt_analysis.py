@@ -4,24 +4,126 @@ Provides intelligent language analysis using OpenAI GPT models
 """
 
 import asyncio
+import gzip
+import hashlib
 import logging
-from typing import Dict, Any, Optional, List
+import time
+from collections import OrderedDict
+from typing import Dict, Any, NamedTuple, Optional, List, Tuple, Union
 from dataclasses import dataclass
+from functools import lru_cache
 import json
 import re
 
+import numpy as np
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+
 try:
-    import openai
-    OPENAI_AVAILABLE = True
+    # Rust JSON parser; its JSONDecodeError subclasses json.JSONDecodeError
+    from orjson import loads as json_loads
 except ImportError:
-    OPENAI_AVAILABLE = False
-    logging.warning("OpenAI not available. Install with: pip install openai")
+    json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# The openai SDK (and httpx/aiohttp with it) is imported on first service
+# construction, not at module import, to keep backend cold starts fast
+_openai = None
+OPENAI_AVAILABLE: Optional[bool] = None
+
+def _load_openai():
+    """Import the openai SDK once; returns the module, or None if it isn't installed"""
+    global _openai, OPENAI_AVAILABLE
+    if OPENAI_AVAILABLE is None:
+        try:
+            import openai
+            _openai = openai
+            OPENAI_AVAILABLE = True
+        except ImportError:
+            OPENAI_AVAILABLE = False
+            logger.warning("OpenAI not available. Install with: pip install openai")
+    return _openai
+
+def _is_transient_error(error: BaseException) -> bool:
+    """Transient API failures worth retrying; other errors (e.g. BadRequestError) fail fast"""
+    return _openai is not None and isinstance(
+        error, (_openai.RateLimitError, _openai.APITimeoutError, _openai.APIConnectionError)
+    )
+
+_retry_transient = retry(
+    retry=retry_if_exception(_is_transient_error),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(3),
+    reraise=True
+)
+
+# Request bodies above this size (long transcripts) are sent gzip-compressed
+GZIP_REQUEST_MIN_BYTES = 4096
+
+async def _gzip_large_body(request) -> None:
+    """httpx request hook: compress large JSON bodies before they go on the wire"""
+    if "Content-Encoding" in request.headers:
+        return
+    body = request.content
+    if len(body) <= GZIP_REQUEST_MIN_BYTES:
+        return
+    import httpx
+    compressed = gzip.compress(body, compresslevel=5)
+    request.headers["Content-Encoding"] = "gzip"
+    request.headers["Content-Length"] = str(len(compressed))
+    request.stream = httpx.ByteStream(compressed)
+    # httpx has no public setter for the buffered body that transports read via
+    # aread(); tests/test_aiohttp_transport.py checks what reaches the server
+    request._content = compressed
+
+# Shared clients keyed by API key, so every service instance reuses one connection pool
+_CLIENT_POOL: Dict[str, Any] = {}
+
+def _get_async_client(api_key: str):
+    """Return the shared AsyncOpenAI client for an API key, creating it on first use"""
+    client = _CLIENT_POOL.get(api_key)
+    if client is None:
+        import httpx
+        
+        event_hooks = {"request": [_gzip_large_body]}
+        try:
+            from app.services.aiohttp_transport import AioHTTPTransport
+            http_client = httpx.AsyncClient(
+                transport=AioHTTPTransport(limit=100, limit_per_host=100),
+                event_hooks=event_hooks
+            )
+        except ImportError:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                event_hooks=event_hooks
+            )
+        # Retries are handled by _retry_transient, so the SDK's own retry loop is disabled
+        client = _CLIENT_POOL[api_key] = _openai.AsyncOpenAI(
+            api_key=api_key, http_client=http_client, max_retries=0
+        )
+    return client
+
+async def close_async_clients():
+    """Close every pooled client, which closes its httpx client and transport session"""
+    while _CLIENT_POOL:
+        _, client = _CLIENT_POOL.popitem()
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close OpenAI client: {e}")
+
+@dataclass(frozen=True)
 class GPTAnalysisResult:
     """Result of GPT-based conversation analysis"""
+    # Explicit __slots__ (dataclass(slots=True) needs Python 3.10; we support 3.9)
+    __slots__ = (
+        'overall_score', 'grammar_score', 'vocabulary_score', 'fluency_score',
+        'pronunciation_score', 'comprehension_score', 'proficiency_level',
+        'strengths', 'areas_for_improvement', 'recommendations',
+        'detailed_feedback', 'grammar_errors', 'vocabulary_analysis'
+    )
+    
     overall_score: float
     grammar_score: float
     vocabulary_score: float
@@ -36,80 +138,264 @@ class GPTAnalysisResult:
     grammar_errors: List[Dict[str, Any]]
     vocabulary_analysis: List[Dict[str, Any]]
 
-class GPTAnalysisService:
-    """GPT-based conversation analysis service using OpenAI models"""
+# Embedding model used to match near-identical transcripts
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Score/level patterns used by _fallback_parse, compiled once
+_SCORE_PATTERNS = {
+    f'{score_type}_score': re.compile(rf'{score_type}[_\s]*score[:\s]*(\d+(?:\.\d+)?)', re.IGNORECASE)
+    for score_type in ('overall', 'grammar', 'vocabulary', 'fluency', 'pronunciation', 'comprehension')
+}
+_LEVEL_PATTERN = re.compile(r'proficiency[_\s]*level[:\s]*([A-C][1-2])', re.IGNORECASE)
+
+class _JSONObjectScanner:
+    """
+    Incremental brace-balanced scanner: feed text in chunks and get back the
+    first complete top-level {...} object as soon as its closing brace arrives.
+    Braces inside JSON strings (including escaped quotes) are ignored.
+    """
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo"):
-        self.api_key = api_key
-        self.model = model
-        self.client = None
-        
-        if OPENAI_AVAILABLE and api_key:
-            openai.api_key = api_key
-            self.client = openai.AsyncOpenAI(api_key=api_key)
-            logger.info(f"GPT Analysis Service initialized with model: {model}")
-        else:
-            logger.warning("GPT Analysis Service not available - no API key provided")
+    def __init__(self):
+        self._parts: List[str] = []
+        self._start: Optional[int] = None
+        self._offset = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
     
-    async def analyze_conversation(
-        self, 
-        transcript: str, 
-        context: str = "General conversation",
-        audio_duration: Optional[float] = None
-    ) -> GPTAnalysisResult:
-        """
-        Analyze conversation using GPT model
+    def feed(self, chunk: str) -> Optional[str]:
+        self._parts.append(chunk)
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == "{":
+                if self._start is None:
+                    self._start = self._offset + i
+                self._depth += 1
+            elif self._start is None:
+                continue
+            elif char == '"':
+                self._in_string = True
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = "".join(self._parts)
+                    return text[self._start:self._offset + i + 1]
+        self._offset += len(chunk)
+        return None
+    
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._parts)
+
+# Values used by _fallback_parse for anything it can't recover. Built once; the
+# nested lists/dicts are shared between results and must be treated as read-only.
+_FALLBACK_DEFAULTS: Dict[str, Any] = {
+    'overall_score': 50.0,
+    'grammar_score': 12.5,
+    'vocabulary_score': 10.0,
+    'fluency_score': 10.0,
+    'pronunciation_score': 7.5,
+    'comprehension_score': 10.0,
+    'proficiency_level': 'B1',
+    'strengths': ['Good communication effort', 'Clear expression'],
+    'areas_for_improvement': ['Continue practicing', 'Expand vocabulary'],
+    'recommendations': ['Keep practicing regularly', 'Read more English texts'],
+    'detailed_feedback': {
+        'grammar_notes': 'Basic grammar structure observed',
+        'vocabulary_notes': 'Appropriate word choice',
+        'fluency_notes': 'Clear communication',
+        'pronunciation_notes': 'Text-based analysis',
+        'comprehension_notes': 'Good understanding demonstrated'
+    },
+    'grammar_errors': [],
+    'vocabulary_analysis': []
+}
+
+def _extract_first_json(text: str) -> Optional[str]:
+    """Return the first balanced top-level {...} span in text, or None (single linear pass)"""
+    return _JSONObjectScanner().feed(text)
+
+# Default account limits used when no shared limiter is supplied
+DEFAULT_REQUESTS_PER_MIN = 3500
+DEFAULT_TOKENS_PER_MIN = 90000
+
+# Encoding used for token budgets; cl100k_base covers the gpt-3.5/gpt-4 families
+TOKEN_ENCODING_MODEL = "gpt-3.5-turbo"
+
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    """tiktoken encoding, loaded on first use (None if tiktoken is unavailable)"""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(TOKEN_ENCODING_MODEL)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+        return None
+
+def _count_tokens(text: str) -> int:
+    """Token count of text; falls back to ~4 characters per token"""
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    # encode_ordinary skips the special-token scan
+    return len(encoding.encode_ordinary(text))
+
+@lru_cache(maxsize=16)
+def _count_static_tokens(text: str) -> int:
+    """Token count of a constant (system message / prompt prefix), computed once"""
+    return _count_tokens(text)
+
+def _estimate_tokens(system_message: str, prompt: str) -> int:
+    """Input tokens for a chat call; static prefixes are counted once per process"""
+    total = _count_static_tokens(system_message)
+    for prefix in (ANALYSIS_PROMPT_PREFIX, CONVERSATION_PROMPT_PREFIX):
+        if prompt.startswith(prefix):
+            return total + _count_static_tokens(prefix) + _count_tokens(prompt[len(prefix):])
+    return total + _count_tokens(prompt)
+
+class _HeuristicAnalysis(NamedTuple):
+    """Stand-in for the fields the reply prompt reads, available before the real analysis"""
+    proficiency_level: str
+    strengths: List[str]
+    areas_for_improvement: List[str]
+
+_CEFR_LEVELS = ('A1', 'A2', 'B1', 'B2', 'C1', 'C2')
+
+def _estimate_analysis(transcript: str) -> _HeuristicAnalysis:
+    """Rough CEFR level from length, lexical diversity and word length"""
+    words = transcript.split()
+    if not words:
+        return _HeuristicAnalysis('A1', [], [])
+    
+    diversity = len({word.lower() for word in words}) / len(words)
+    avg_word_length = sum(len(word) for word in words) / len(words)
+    score = (
+        (len(words) >= 30) + (len(words) >= 80) + (diversity >= 0.5)
+        + (avg_word_length >= 4.5) + (avg_word_length >= 5.2)
+    )
+    return _HeuristicAnalysis(
+        proficiency_level=_CEFR_LEVELS[score],
+        strengths=['Willingness to communicate'],
+        areas_for_improvement=['Expanding vocabulary'] if diversity < 0.5 else ['Developing longer answers']
+    )
+
+class RateLimiter:
+    """Token buckets for requests/minute and tokens/minute, refilled continuously
+    
+    The request rate follows AIMD: each 429 cuts it by 20%, and every minute
+    without one adds recovery_per_min back (5% of the configured rate by
+    default) until it is back at the configured rate.
+    """
+    
+    def __init__(self, requests_per_min: float, tokens_per_min: float, recovery_per_min: Optional[float] = None):
+        self.max_requests_per_min = float(requests_per_min)
+        self.requests_per_min = self.max_requests_per_min
+        self.recovery_per_min = (
+            float(recovery_per_min) if recovery_per_min is not None
+            else max(1.0, self.max_requests_per_min * 0.05)
+        )
+        self.tokens_per_min = float(tokens_per_min)
+        self._available_requests = self.requests_per_min
+        self._available_tokens = self.tokens_per_min
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_min = (now - self._last_refill) / 60
+        self._last_refill = now
+        # Additive increase after a backoff
+        self.requests_per_min = min(
+            self.max_requests_per_min, self.requests_per_min + elapsed_min * self.recovery_per_min
+        )
+        self._available_requests = min(
+            self.requests_per_min, self._available_requests + elapsed_min * self.requests_per_min
+        )
+        self._available_tokens = min(
+            self.tokens_per_min, self._available_tokens + elapsed_min * self.tokens_per_min
+        )
+    
+    async def acquire(self, est_tokens: int):
+        """Wait until one request and est_tokens tokens fit in the buckets, then take them"""
+        est_tokens = min(est_tokens, self.tokens_per_min)
+        # Waiters queue on the lock, so capacity is handed out in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= est_tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= est_tokens
+                    return
+                wait_min = max(
+                    (1 - self._available_requests) / self.requests_per_min,
+                    (est_tokens - self._available_tokens) / self.tokens_per_min
+                )
+                await asyncio.sleep(wait_min * 60)
+    
+    def on_rate_limited(self):
+        """Back off multiplicatively after a 429 from the API"""
+        # Credit the quiet time before this 429 at the old rate first
+        self._refill()
+        self.requests_per_min = max(1.0, self.requests_per_min * 0.8)
+        self._available_requests = min(self._available_requests, self.requests_per_min)
+
+class AnalysisCache:
+    """Exact-match TTL cache of analyses with an optional embedding-similarity tier"""
+    
+    def __init__(self, maxsize: int = 1024, ttl: int = 86400, similarity_threshold: Optional[float] = None):
+        self.similarity_threshold = similarity_threshold
+        self.maxsize = maxsize
+        self._results: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # key -> (scope, unit-length embedding), oldest first
+        self._embeddings: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional["GPTAnalysisResult"]:
+        return self._results.get(key)
+    
+    def find_similar(self, scope: str, embedding: np.ndarray) -> Optional["GPTAnalysisResult"]:
+        """Return a cached result in the same scope whose transcript embedding is close enough to this one
+        
+        scope must pin down everything besides the transcript that the result
+        depends on - user, model, context and audio duration - so an analysis
+        is never handed to another student.
         """
-        if not self.client:
-            raise RuntimeError("GPT client not initialized. Please provide OpenAI API key.")
+        keys = [
+            key for key, (entry_scope, _) in self._embeddings.items()
+            if entry_scope == scope and key in self._results
+        ]
+        if not keys:
+            return None
         
-        try:
-            # Create analysis prompt
-            prompt = self._create_analysis_prompt(transcript, context, audio_duration)
-            
-            # Get GPT analysis
-            analysis_text = await self._get_gpt_analysis(prompt)
-            
-            # Parse GPT response
-            analysis_data = self._parse_gpt_response(analysis_text)
-            
-            # Create result object
-            result = GPTAnalysisResult(
-                overall_score=analysis_data.get('overall_score', 0),
-                grammar_score=analysis_data.get('grammar_score', 0),
-                vocabulary_score=analysis_data.get('vocabulary_score', 0),
-                fluency_score=analysis_data.get('fluency_score', 0),
-                pronunciation_score=analysis_data.get('pronunciation_score', 0),
-                comprehension_score=analysis_data.get('comprehension_score', 0),
-                proficiency_level=analysis_data.get('proficiency_level', 'A1'),
-                strengths=analysis_data.get('strengths', []),
-                areas_for_improvement=analysis_data.get('areas_for_improvement', []),
-                recommendations=analysis_data.get('recommendations', []),
-                detailed_feedback=analysis_data.get('detailed_feedback', {}),
-                grammar_errors=analysis_data.get('grammar_errors', []),
-                vocabulary_analysis=analysis_data.get('vocabulary_analysis', [])
-            )
-            
-            logger.info(f"GPT analysis completed successfully for transcript: {transcript[:50]}...")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error in GPT analysis: {e}")
-            raise
+        matrix = np.stack([self._embeddings[key][1] for key in keys])
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._results.get(keys[best])
     
-    def _create_analysis_prompt(self, transcript: str, context: str, audio_duration: Optional[float]) -> str:
-        """Create a detailed prompt for GPT analysis"""
-        
-        prompt = f"""
-You are an expert English language teacher and assessor. Please analyze the following English conversation transcript and provide a comprehensive evaluation.
+    def put(self, key: str, result: "GPTAnalysisResult", scope: str, embedding: Optional[np.ndarray] = None):
+        self._results[key] = result
+        if embedding is not None:
+            self._embeddings[key] = (scope, embedding)
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > self.maxsize:
+                self._embeddings.popitem(last=False)
 
-TRANSCRIPT: "{transcript}"
-CONTEXT: {context}
-AUDIO DURATION: {audio_duration or 'Not specified'} seconds
+# Static analysis instructions. Kept byte-identical across calls and placed before
+# any per-request text so OpenAI prompt caching can reuse the prefix.
+ANALYSIS_PROMPT_PREFIX = """
+You are an expert English language teacher and assessor. Please analyze the English conversation transcript given at the end and provide a comprehensive evaluation.
 
 Please provide your analysis in the following JSON format:
 
-{{
+{
     "overall_score": <number between 0-100>,
     "grammar_score": <number between 0-25>,
     "vocabulary_score": <number between 0-20>,
@@ -132,30 +418,30 @@ Please provide your analysis in the following JSON format:
         "<specific recommendation 2>",
         "<specific recommendation 3>"
     ],
-    "detailed_feedback": {{
+    "detailed_feedback": {
         "grammar_notes": "<detailed grammar analysis>",
         "vocabulary_notes": "<detailed vocabulary analysis>",
         "fluency_notes": "<detailed fluency analysis>",
         "pronunciation_notes": "<detailed pronunciation analysis>",
         "comprehension_notes": "<detailed comprehension analysis>"
-    }},
+    },
     "grammar_errors": [
-        {{
+        {
             "type": "<error type>",
             "description": "<error description>",
             "severity": "<low|medium|high>",
             "position": <character position>
-        }}
+        }
     ],
     "vocabulary_analysis": [
-        {{
+        {
             "word": "<word>",
             "complexity_score": <number>,
             "is_advanced": <true|false>,
             "frequency": <number>
-        }}
+        }
     ]
-}}
+}
 
 EVALUATION CRITERIA:
 - Grammar (0-25): Sentence structure, verb tenses, articles, prepositions, subject-verb agreement
@@ -174,36 +460,331 @@ CEFR LEVELS:
 
 Please be thorough, accurate, and constructive in your analysis. Focus on specific, actionable feedback.
 """
-        return prompt
+
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert English language teacher and assessor. Always respond with valid JSON format."
+
+CONVERSATION_PROMPT_PREFIX = """
+You are an intelligent English language teacher having a conversation with a student.
+
+Generate a natural, engaging response to the student message below that:
+1. Acknowledges their message appropriately
+2. Provides educational value
+3. Asks a follow-up question related to the topic
+4. Adapts to their proficiency level (STUDENT LEVEL)
+5. Is encouraging and supportive
+
+Keep your response conversational, natural, and educational. Ask a question that will help them practice more.
+"""
+
+CONVERSATION_SYSTEM_MESSAGE = "You are an intelligent English language teacher. Provide engaging, educational responses that help students improve their English."
+
+class GPTAnalysisService:
+    """GPT-based conversation analysis service using OpenAI models"""
     
-    async def _get_gpt_analysis(self, prompt: str) -> str:
-        """Get analysis from GPT model"""
+    def __init__(
+        self, 
+        api_key: Optional[str] = None, 
+        model: str = "gpt-3.5-turbo",
+        cache_ttl_seconds: Optional[int] = 86400,
+        semantic_cache_threshold: Optional[float] = None,
+        max_concurrency: int = 10,
+        rate_limiter: Optional[RateLimiter] = None,
+        json_mode: bool = True,
+        max_analysis_tokens: int = 900,
+        max_response_tokens: int = 120,
+        fast_model: Optional[str] = "gpt-4o-mini",
+        short_transcript_chars: int = 300
+    ):
+        self.api_key = api_key
+        self.model = model
+        # Cheaper tier for short transcripts and chat replies (None = always use `model`)
+        self.fast_model = fast_model or model
+        self.short_transcript_chars = short_transcript_chars
+        # JSON mode (response_format=json_object); disable for models that don't support it
+        self.json_mode = json_mode
+        # Models that answered a JSON-mode request with 400; they are called without it
+        self._json_mode_unsupported: set = set()
+        # Completion budgets sized to the expected output; these also count against TPM
+        self.max_analysis_tokens = max_analysis_tokens
+        self.max_response_tokens = max_response_tokens
+        self.max_concurrency = max_concurrency
+        # Proactive throttling keeps batches under the account limits instead of hitting 429s
+        self.rate_limiter = rate_limiter or RateLimiter(
+            requests_per_min=DEFAULT_REQUESTS_PER_MIN, tokens_per_min=DEFAULT_TOKENS_PER_MIN
+        )
+        self._openai = None
+        self.client = None
+        # Repeated practice transcripts are answered from cache instead of a new API call
+        self.cache = (
+            AnalysisCache(ttl=cache_ttl_seconds, similarity_threshold=semantic_cache_threshold)
+            if cache_ttl_seconds else None
+        )
+        
+        if api_key and _load_openai() is not None:
+            self._openai = _openai
+            self.client = _get_async_client(api_key)
+            logger.info(f"GPT Analysis Service initialized with model: {model}")
+        else:
+            logger.warning("GPT Analysis Service not available - no API key provided")
+    
+    async def analyze_conversation(
+        self, 
+        transcript: str, 
+        context: str = "General conversation",
+        audio_duration: Optional[float] = None,
+        user_id: Optional[str] = None
+    ) -> GPTAnalysisResult:
+        """
+        Analyze conversation using GPT model
+        
+        The similarity cache tier is only consulted for a known user_id, and
+        only among that user's own earlier analyses.
+        """
+        if not self.client:
+            raise RuntimeError("GPT client not initialized. Please provide OpenAI API key.")
+        
+        model = self.fast_model if len(transcript) < self.short_transcript_chars else self.model
+        cache_key = f"{model}|{context}|{audio_duration}|{transcript}"
+        cache_key = hashlib.blake2b(cache_key.encode("utf-8"), digest_size=16).hexdigest()
+        similarity_scope = f"{user_id}|{model}|{context}|{audio_duration}"
+        embedding = None
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            if self.cache.similarity_threshold is not None and user_id is not None:
+                embedding = await self._embed(transcript)
+                if embedding is not None:
+                    cached = self.cache.find_similar(similarity_scope, embedding)
+                    if cached is not None:
+                        return cached
+        
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
+            # Create analysis prompt
+            prompt = self._create_analysis_prompt(transcript, context, audio_duration)
+            
+            # Get GPT analysis
+            logger.debug(f"Analyzing {len(transcript)}-char transcript with {model}")
+            analysis_text = await self._get_gpt_analysis(prompt, model)
+            
+            # Parse GPT response
+            analysis_data = self._parse_gpt_response(analysis_text)
+            
+            # Create result object
+            result = GPTAnalysisResult(
+                overall_score=analysis_data.get('overall_score', 0),
+                grammar_score=analysis_data.get('grammar_score', 0),
+                vocabulary_score=analysis_data.get('vocabulary_score', 0),
+                fluency_score=analysis_data.get('fluency_score', 0),
+                pronunciation_score=analysis_data.get('pronunciation_score', 0),
+                comprehension_score=analysis_data.get('comprehension_score', 0),
+                proficiency_level=analysis_data.get('proficiency_level', 'A1'),
+                strengths=analysis_data.get('strengths', []),
+                areas_for_improvement=analysis_data.get('areas_for_improvement', []),
+                recommendations=analysis_data.get('recommendations', []),
+                detailed_feedback=analysis_data.get('detailed_feedback', {}),
+                grammar_errors=analysis_data.get('grammar_errors', []),
+                vocabulary_analysis=analysis_data.get('vocabulary_analysis', [])
+            )
+            
+            logger.info(f"GPT analysis completed successfully for transcript: {transcript[:50]}...")
+            if self.cache is not None:
+                self.cache.put(cache_key, result, similarity_scope, embedding)
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error in GPT analysis: {e}")
+            raise
+    
+    async def analyze_conversations_batch(
+        self, 
+        items: List[Tuple[str, str, Optional[float]]]
+    ) -> List[Union[GPTAnalysisResult, BaseException]]:
+        """
+        Analyze several (transcript, context, audio_duration) items concurrently.
+        Results keep the input order; a failed item yields its exception.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def _analyze_one(transcript: str, context: str, audio_duration: Optional[float]):
+            async with semaphore:
+                return await self.analyze_conversation(transcript, context, audio_duration)
+        
+        return await asyncio.gather(
+            *(_analyze_one(*item) for item in items),
+            return_exceptions=True
+        )
+    
+    async def analyze_and_respond(
+        self, 
+        transcript: str, 
+        context: str = "General conversation",
+        topic: str = "General conversation",
+        conversation_history: List[Dict[str, Any]] = None,
+        audio_duration: Optional[float] = None,
+        user_id: Optional[str] = None
+    ) -> Tuple[GPTAnalysisResult, str]:
+        """
+        Analyze a transcript and generate the teacher's reply concurrently.
+        The reply is conditioned on a heuristic level estimate so it doesn't
+        have to wait for the full analysis.
+        """
+        return await asyncio.gather(
+            self.analyze_conversation(transcript, context, audio_duration, user_id),
+            self.generate_conversation_response(
+                transcript, _estimate_analysis(transcript), topic, conversation_history
+            )
+        )
+    
+    async def _embed(self, text: str) -> Optional[np.ndarray]:
+        """Unit-length embedding of a transcript for the similarity cache"""
+        try:
+            response = await self._embedding(text)
+            vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+            return vector / np.linalg.norm(vector)
+        except Exception as e:
+            logger.warning(f"Embedding failed, skipping similarity cache: {e}")
+            return None
+    
+    @_retry_transient
+    async def _embedding(self, text: str):
+        """Rate-limited embeddings call, retried like the chat completions"""
+        await self.rate_limiter.acquire(_count_tokens(text))
+        try:
+            return await self.client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+        except self._openai.RateLimitError:
+            self.rate_limiter.on_rate_limited()
+            raise
+    
+    def _create_analysis_prompt(self, transcript: str, context: str, audio_duration: Optional[float]) -> str:
+        """Create a detailed prompt for GPT analysis (static rubric first so it is prompt-cached)"""
+        return (
+            f'{ANALYSIS_PROMPT_PREFIX}\n'
+            f'TRANSCRIPT: "{transcript}"\n'
+            f'CONTEXT: {context}\n'
+            f"AUDIO DURATION: {audio_duration or 'Not specified'} seconds\n"
+        )
+    
+    @_retry_transient
+    async def _chat_completion(
+        self, 
+        model: str, 
+        system_message: str, 
+        prompt: str, 
+        temperature: float, 
+        max_tokens: int, 
+        timeout: float,
+        n: int = 1
+    ):
+        """Rate-limited chat completion call, retried with jittered backoff on transient errors"""
+        await self.rate_limiter.acquire(_estimate_tokens(system_message, prompt) + max_tokens * n)
+        try:
+            return await self.client.chat.completions.create(
+                model=model,
                 messages=[
-                    {"role": "system", "content": "You are an expert English language teacher and assessor. Always respond with valid JSON format."},
+                    {"role": "system", "content": system_message},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.3,  # Lower temperature for more consistent analysis
-                max_tokens=2000,
-                timeout=30
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                n=n
             )
-            
-            return response.choices[0].message.content
+        except self._openai.RateLimitError:
+            self.rate_limiter.on_rate_limited()
+            raise
+    
+    @_retry_transient
+    async def _stream_chat_json(
+        self, 
+        model: str, 
+        system_message: str, 
+        prompt: str, 
+        temperature: float, 
+        max_tokens: int, 
+        timeout: float,
+        json_mode: bool = False
+    ) -> str:
+        """
+        Streamed chat completion that returns as soon as the first complete JSON
+        object has arrived (closing the stream early); otherwise the full text.
+        """
+        await self.rate_limiter.acquire(_estimate_tokens(system_message, prompt) + max_tokens)
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout,
+                stream=True,
+                **({"response_format": {"type": "json_object"}} if json_mode else {})
+            )
+        except self._openai.RateLimitError:
+            self.rate_limiter.on_rate_limited()
+            raise
+        
+        scanner = _JSONObjectScanner()
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    json_text = scanner.feed(delta)
+                    if json_text is not None:
+                        return json_text
+        finally:
+            await stream.response.aclose()
+        return scanner.text
+    
+    async def _get_gpt_analysis(self, prompt: str, model: str) -> str:
+        """Get analysis from GPT model"""
+        json_mode = self.json_mode and model not in self._json_mode_unsupported
+        try:
+            try:
+                return await self._stream_analysis(prompt, model, json_mode)
+            except Exception as e:
+                if not (json_mode and isinstance(e, self._openai.BadRequestError)):
+                    raise
+                # e.g. gpt-4 rejects response_format; the prompt still asks for JSON
+                logger.warning(f"{model} rejected JSON mode, retrying without it: {e}")
+                self._json_mode_unsupported.add(model)
+                return await self._stream_analysis(prompt, model, json_mode=False)
             
         except Exception as e:
             logger.error(f"Error calling GPT API: {e}")
             raise
     
+    async def _stream_analysis(self, prompt: str, model: str, json_mode: bool) -> str:
+        """One streamed analysis call with the analysis budget and settings"""
+        return await self._stream_chat_json(
+            model,
+            ANALYSIS_SYSTEM_MESSAGE,
+            prompt,
+            temperature=0.3,  # Lower temperature for more consistent analysis
+            max_tokens=self.max_analysis_tokens,
+            timeout=30,
+            json_mode=json_mode
+        )
+    
     def _parse_gpt_response(self, response_text: str) -> Dict[str, Any]:
         """Parse GPT response and extract analysis data"""
+        # JSON mode responses are the object itself; no extraction needed
+        try:
+            return json_loads(response_text)
+        except json.JSONDecodeError:
+            pass
+        
         try:
-            # Try to extract JSON from response
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-                return json.loads(json_str)
+            # Models without JSON mode may wrap the object in prose
+            json_str = _extract_first_json(response_text)
+            if json_str is not None:
+                return json_loads(json_str)
             else:
                 # Fallback parsing if JSON extraction fails
                 return self._fallback_parse(response_text)
@@ -217,45 +798,19 @@ Please be thorough, accurate, and constructive in your analysis. Focus on specif
         # Extract scores using regex
         scores = {}
         
-        # Extract overall score
-        overall_match = re.search(r'overall[_\s]*score[:\s]*(\d+(?:\.\d+)?)', response_text, re.IGNORECASE)
-        if overall_match:
-            scores['overall_score'] = float(overall_match.group(1))
-        
-        # Extract individual scores
-        for score_type in ['grammar', 'vocabulary', 'fluency', 'pronunciation', 'comprehension']:
-            pattern = rf'{score_type}[_\s]*score[:\s]*(\d+(?:\.\d+)?)'
-            match = re.search(pattern, response_text, re.IGNORECASE)
+        # Extract overall and individual scores
+        for score_key, pattern in _SCORE_PATTERNS.items():
+            match = pattern.search(response_text)
             if match:
-                scores[f'{score_type}_score'] = float(match.group(1))
+                scores[score_key] = float(match.group(1))
         
         # Extract proficiency level
-        level_match = re.search(r'proficiency[_\s]*level[:\s]*([A-C][1-2])', response_text, re.IGNORECASE)
+        level_match = _LEVEL_PATTERN.search(response_text)
         if level_match:
             scores['proficiency_level'] = level_match.group(1).upper()
         
-        # Default values
-        return {
-            'overall_score': scores.get('overall_score', 50.0),
-            'grammar_score': scores.get('grammar_score', 12.5),
-            'vocabulary_score': scores.get('vocabulary_score', 10.0),
-            'fluency_score': scores.get('fluency_score', 10.0),
-            'pronunciation_score': scores.get('pronunciation_score', 7.5),
-            'comprehension_score': scores.get('comprehension_score', 10.0),
-            'proficiency_level': scores.get('proficiency_level', 'B1'),
-            'strengths': ['Good communication effort', 'Clear expression'],
-            'areas_for_improvement': ['Continue practicing', 'Expand vocabulary'],
-            'recommendations': ['Keep practicing regularly', 'Read more English texts'],
-            'detailed_feedback': {
-                'grammar_notes': 'Basic grammar structure observed',
-                'vocabulary_notes': 'Appropriate word choice',
-                'fluency_notes': 'Clear communication',
-                'pronunciation_notes': 'Text-based analysis',
-                'comprehension_notes': 'Good understanding demonstrated'
-            },
-            'grammar_errors': [],
-            'vocabulary_analysis': []
-        }
+        # Defaults overridden by whatever scores were found
+        return {**_FALLBACK_DEFAULTS, **scores}
     
     async def generate_conversation_response(
         self, 
@@ -265,58 +820,63 @@ Please be thorough, accurate, and constructive in your analysis. Focus on specif
         conversation_history: List[Dict[str, Any]] = None
     ) -> str:
         """Generate intelligent conversation response based on analysis"""
+        responses = await self.generate_conversation_responses(
+            user_message, analysis, topic, conversation_history
+        )
+        return responses[0]
+    
+    async def generate_conversation_responses(
+        self, 
+        user_message: str, 
+        analysis: GPTAnalysisResult, 
+        topic: str,
+        conversation_history: List[Dict[str, Any]] = None,
+        num_variants: int = 1
+    ) -> List[str]:
+        """
+        Generate one or more candidate responses in a single request (n=num_variants),
+        so the prompt is billed once and only one request slot is used
+        """
         
         if not self.client:
-            return self._fallback_response(user_message, analysis, topic)
+            return [self._fallback_response(user_message, analysis, topic)]
         
         try:
             # Create conversation prompt
             prompt = self._create_conversation_prompt(user_message, analysis, topic, conversation_history)
             
             # Get GPT response
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an intelligent English language teacher. Provide engaging, educational responses that help students improve their English."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await self._chat_completion(
+                self.fast_model,
+                CONVERSATION_SYSTEM_MESSAGE,
+                prompt,
                 temperature=0.7,
-                max_tokens=300,
-                timeout=20
+                max_tokens=self.max_response_tokens,
+                timeout=20,
+                n=num_variants
             )
             
-            return response.choices[0].message.content.strip()
+            return [choice.message.content.strip() for choice in response.choices]
             
         except Exception as e:
             logger.error(f"Error generating conversation response: {e}")
-            return self._fallback_response(user_message, analysis, topic)
+            return [self._fallback_response(user_message, analysis, topic)]
     
     def _create_conversation_prompt(self, user_message: str, analysis: GPTAnalysisResult, topic: str, history: List[Dict[str, Any]] = None) -> str:
-        """Create prompt for conversation response"""
+        """Create prompt for conversation response (static instructions first so they are prompt-cached)"""
         
         proficiency_level = analysis.proficiency_level
         strengths = ', '.join(analysis.strengths[:2])
         improvements = ', '.join(analysis.areas_for_improvement[:2])
         
-        prompt = f"""
-You are an intelligent English language teacher having a conversation with a student.
-
-STUDENT MESSAGE: "{user_message}"
-TOPIC: {topic}
-STUDENT LEVEL: {proficiency_level}
-STUDENT STRENGTHS: {strengths}
-AREAS TO IMPROVE: {improvements}
-
-Generate a natural, engaging response that:
-1. Acknowledges their message appropriately
-2. Provides educational value
-3. Asks a follow-up question related to the topic
-4. Adapts to their proficiency level ({proficiency_level})
-5. Is encouraging and supportive
-
-Keep your response conversational, natural, and educational. Ask a question that will help them practice more.
-"""
-        return prompt
+        return (
+            f'{CONVERSATION_PROMPT_PREFIX}\n'
+            f'STUDENT MESSAGE: "{user_message}"\n'
+            f'TOPIC: {topic}\n'
+            f'STUDENT LEVEL: {proficiency_level}\n'
+            f'STUDENT STRENGTHS: {strengths}\n'
+            f'AREAS TO IMPROVE: {improvements}\n'
+        )
     
     def _fallback_response(self, user_message: str, analysis: GPTAnalysisResult, topic: str) -> str:
         """Fallback response when GPT is not available"""
@@ -5,12 +5,29 @@ Simple test script to verify LLaMA service works
 import asyncio
 import sys
 import os
+import time
 
 # Add the app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.services.llama_analysis import llama_service
 
+TEST_TOPICS = [
+    "the importance of education and how it shapes our future",
+    "my favourite books and why I read them",
+    "travelling abroad and trying local food",
+    "how technology changes the way we work",
+]
+
+def transcript_variant(i: int) -> str:
+    """Distinct transcript per request, so none are served from the response cache"""
+    topic = TEST_TOPICS[i % len(TEST_TOPICS)]
+    return (
+        f"Hello, I am student number {i + 1} practicing my English conversation skills. "
+        f"I enjoy learning new languages and meeting people from different cultures. "
+        f"Today I want to discuss {topic}."
+    )
+
 async def test_llama_service():
     """Test the LLaMA analysis service"""
     print("Testing LLaMA Analysis Service...")
@@ -51,6 +68,28 @@ async def test_llama_service():
         for rec in result.recommendations:
             print(f"  - {rec}")
         
+        # Concurrent requests should be batched together by the service
+        transcripts = [transcript_variant(i) for i in range(16)]
+        print(f"\nAnalyzing {len(transcripts)} conversations concurrently...")
+        
+        async def timed_analysis(transcript: str) -> float:
+            start = time.perf_counter()
+            await llama_service.analyze_conversation(
+                transcript=transcript,
+                context="General conversation practice",
+                audio_duration=30.0
+            )
+            return time.perf_counter() - start
+        
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed_analysis(t) for t in transcripts))
+        wall_clock = time.perf_counter() - start
+        
+        print(f"Wall clock: {wall_clock:.2f}s")
+        print(f"Mean per-request latency: {sum(latencies) / len(latencies):.2f}s")
+        print(f"Serial equivalent: {sum(latencies):.2f}s ({sum(latencies) / wall_clock:.1f}x overlap)")
+        
+        await llama_service.close()
         return True
         
     except Exception as e:
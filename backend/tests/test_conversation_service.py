@@ -0,0 +1,39 @@
+"""Ownership check in ConversationService.get_conversation"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.conversation_service import ConversationService
+
+class _Session:
+    """Just enough of AsyncSession for a primary-key lookup"""
+
+    def __init__(self, conversation):
+        self._conversation = conversation
+
+    async def get(self, model, ident):
+        return self._conversation
+
+@pytest.mark.asyncio
+async def test_owner_with_str_user_id_gets_conversation():
+    owner_id = uuid.uuid4()
+    conversation = SimpleNamespace(id=uuid.uuid4(), user_id=owner_id)
+
+    # AuthService builds User(id=payload["sub"]), so the id arrives as a str
+    result = await ConversationService().get_conversation(
+        conversation.id, str(owner_id), _Session(conversation)
+    )
+
+    assert result is conversation
+
+@pytest.mark.asyncio
+async def test_other_user_gets_none():
+    conversation = SimpleNamespace(id=uuid.uuid4(), user_id=uuid.uuid4())
+
+    result = await ConversationService().get_conversation(
+        conversation.id, str(uuid.uuid4()), _Session(conversation)
+    )
+
+    assert result is None
@@ -0,0 +1,46 @@
+"""AIMD request-rate adjustment in RateLimiter"""
+
+import pytest
+
+from app.services import gpt_analysis
+from app.services.gpt_analysis import RateLimiter
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic, in seconds"""
+    now = [1000.0]
+    monkeypatch.setattr(gpt_analysis.time, "monotonic", lambda: now[0])
+    return now
+
+def test_rate_limited_cuts_request_rate(clock):
+    limiter = RateLimiter(requests_per_min=100, tokens_per_min=10000)
+
+    limiter.on_rate_limited()
+    assert limiter.requests_per_min == pytest.approx(80)
+
+    limiter.on_rate_limited()
+    assert limiter.requests_per_min == pytest.approx(64)
+
+def test_request_rate_has_floor(clock):
+    limiter = RateLimiter(requests_per_min=2, tokens_per_min=10000)
+
+    for _ in range(10):
+        limiter.on_rate_limited()
+
+    assert limiter.requests_per_min == 1.0
+
+def test_request_rate_recovers_up_to_configured_rate(clock):
+    limiter = RateLimiter(requests_per_min=100, tokens_per_min=10000, recovery_per_min=4)
+    for _ in range(5):
+        limiter.on_rate_limited()
+    reduced = limiter.requests_per_min
+
+    # Two quiet minutes add two recovery steps
+    clock[0] += 120
+    limiter._refill()
+    assert limiter.requests_per_min == pytest.approx(reduced + 8)
+
+    # ...and the rate never goes past the configured one
+    clock[0] += 3600
+    limiter._refill()
+    assert limiter.requests_per_min == 100
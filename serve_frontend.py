@@ -5,7 +5,7 @@ Serves the frontend.html file to avoid CORS issues with file:// URLs
 """
 
 import http.server
-import socketserver
+import io
 import webbrowser
 import os
 from pathlib import Path
@@ -30,11 +30,30 @@ def serve_frontend():
             if self.path == '/' or self.path == '/index.html':
                 self.path = '/frontend.html'
             return super().do_GET()
+        
+        def copyfile(self, source, outputfile):
+            # Hand the file straight from the page cache to the socket
+            if not hasattr(os, "sendfile"):
+                return super().copyfile(source, outputfile)
+            try:
+                in_fd, out_fd = source.fileno(), outputfile.fileno()
+            except (AttributeError, io.UnsupportedOperation):
+                return super().copyfile(source, outputfile)
+            
+            offset = source.tell()
+            remaining = os.fstat(in_fd).st_size - offset
+            while remaining > 0:
+                sent = os.sendfile(out_fd, in_fd, offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
     
     # Start the server
     PORT = 3000
     
-    with socketserver.TCPServer(("", PORT), FrontendHandler) as httpd:
+    # One thread per connection so the page and its assets load in parallel
+    with http.server.ThreadingHTTPServer(("", PORT), FrontendHandler) as httpd:
         print(f"Frontend server running at http://localhost:{PORT}")
         print("Opening browser...")
         
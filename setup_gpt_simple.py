@@ -6,55 +6,48 @@ Helps users set up GPT models for the Language Teacher application
 
 import os
 import sys
-from pathlib import Path
+from dataclasses import dataclass
+from functools import lru_cache
 
-def setup_gpt_config():
-    """Interactive setup for GPT configuration"""
-    
-    print("GPT Configuration Setup for Language Teacher")
-    print("=" * 50)
-    
-    # Check if .env file exists
-    env_file = Path("backend/.env")
-    if env_file.exists():
-        print(f"Found existing .env file at {env_file}")
-        overwrite = input("Do you want to overwrite it? (y/N): ").lower().strip()
-        if overwrite != 'y':
-            print("Setup cancelled.")
-            return
-    
-    # Get OpenAI API key
-    print("\nOpenAI API Key Setup")
-    print("You can get your API key from: https://platform.openai.com/api-keys")
-    api_key = input("Enter your OpenAI API key (or press Enter to skip): ").strip()
-    
-    if not api_key:
-        print("No API key provided. GPT analysis will be disabled.")
-        use_gpt = False
-    else:
-        use_gpt = True
-    
-    # Choose GPT model
-    if use_gpt:
-        print("\nGPT Model Selection")
-        print("Available models:")
-        print("1. gpt-3.5-turbo (recommended, cost-effective)")
-        print("2. gpt-4 (more accurate, more expensive)")
-        print("3. gpt-4-turbo (latest, most capable)")
-        
-        model_choice = input("Choose model (1-3, default: 1): ").strip()
-        
-        models = {
-            "1": "gpt-3.5-turbo",
-            "2": "gpt-4", 
-            "3": "gpt-4-turbo"
-        }
-        
-        gpt_model = models.get(model_choice, "gpt-3.5-turbo")
-        print(f"Selected model: {gpt_model}")
-    
-    # Create .env file
-    env_content = f"""# Language Teacher Application Environment Configuration
+# Models offered by the setup menu, the first being the default
+_GPT_MODELS = (
+    ("gpt-3.5-turbo", "recommended, cost-effective"),
+    ("gpt-4", "more accurate, more expensive"),
+    ("gpt-4-turbo", "latest, most capable"),
+)
+_GPT_MENU = "\n".join(
+    f"{number}. {model} ({description})"
+    for number, (model, description) in enumerate(_GPT_MODELS, 1)
+)
+_GPT_MODEL_CHOICES = {str(number): model for number, (model, _) in enumerate(_GPT_MODELS, 1)}
+
+# Console messages, each written in one go
+_BANNER = "GPT Configuration Setup for Language Teacher\n" + "=" * 50 + "\n"
+_API_KEY_HELP = (
+    "\nOpenAI API Key Setup\n"
+    "You can get your API key from: https://platform.openai.com/api-keys\n"
+)
+_MODEL_SELECTION = "\nGPT Model Selection\nAvailable models:\n" + _GPT_MENU + "\n"
+_OK_MSG = (
+    "\nGPT Setup Complete!\n"
+    "   Using GPT model: {gpt_model}\n"
+    "   API key configured\n"
+    "   GPT analysis enabled\n"
+)
+_SKIP_MSG = (
+    "\nGPT Setup Skipped\n"
+    "   LLaMA fallback will be used\n"
+    "   Add OPENAI_API_KEY to enable GPT\n"
+)
+_NEXT_STEPS = (
+    "\nNext Steps:\n"
+    "   1. Restart the backend server\n"
+    "   2. Test the analysis in the frontend\n"
+    "   3. Check server status indicator\n"
+)
+
+# Static parts of the generated .env, around the GPT settings
+_ENV_TEMPLATE_HEAD = """# Language Teacher Application Environment Configuration
 
 # Application Settings
 DEBUG=false
@@ -79,12 +72,9 @@ MAX_FILE_SIZE_MB=100
 ALLOWED_AUDIO_FORMATS=["mp3", "wav", "webm", "ogg"]
 
 # AI Model Configuration
-USE_GPT_ANALYSIS={str(use_gpt).lower()}
-
-# GPT Configuration (OpenAI)
-OPENAI_API_KEY={api_key if api_key else "your_openai_api_key_here"}
-GPT_MODEL={gpt_model if use_gpt else "gpt-3.5-turbo"}
+"""
 
+_ENV_TEMPLATE_TAIL = """
 # LLaMA Configuration (fallback)
 LLAMA_MODEL_NAME=microsoft/DialoGPT-medium
 LLAMA_MAX_LENGTH=1024
@@ -95,27 +85,103 @@ ANALYSIS_TIMEOUT_SECONDS=300
 CACHE_ANALYSIS_RESULTS=true
 CACHE_TTL_HOURS=24
 """
+
+@dataclass(frozen=True)
+class _EnvConfig:
+    """Setup answers already given through the environment"""
+    api_key: str
+    gpt_model: str
+    overwrite: bool
+
+@lru_cache(maxsize=None)
+def _env_config() -> _EnvConfig:
+    """Environment snapshot, read once"""
+    return _EnvConfig(
+        api_key=os.environ.get("OPENAI_API_KEY", "").strip(),
+        gpt_model=os.environ.get("GPT_MODEL", "").strip(),
+        overwrite=os.environ.get("ENV_OVERWRITE") == "1"
+    )
+
+def setup_gpt_config():
+    """Interactive setup for GPT configuration
+    
+    OPENAI_API_KEY, GPT_MODEL and ENV_OVERWRITE=1 in the environment answer
+    the matching prompts, so scripted runs don't block on input.
+    """
+    config = _env_config()
+    
+    sys.stdout.write(_BANNER)
+    
+    # Check if .env file exists
+    env_file = os.path.join("backend", ".env")
+    # Only presence matters, and a symlink counts as present
+    if os.path.lexists(env_file):
+        print(f"Found existing .env file at {env_file}")
+        if config.overwrite:
+            overwrite = 'y'
+        else:
+            overwrite = input("Do you want to overwrite it? (y/N): ").lower().strip()
+        if overwrite != 'y':
+            print("Setup cancelled.")
+            return
+    
+    # Get OpenAI API key
+    if config.api_key:
+        api_key = config.api_key
+    else:
+        sys.stdout.write(_API_KEY_HELP)
+        api_key = input("Enter your OpenAI API key (or press Enter to skip): ").strip()
+    
+    if not api_key:
+        print("No API key provided. GPT analysis will be disabled.")
+        use_gpt = False
+    else:
+        use_gpt = True
+    
+    # Choose GPT model
+    if use_gpt:
+        if config.gpt_model:
+            gpt_model = config.gpt_model
+        else:
+            sys.stdout.write(_MODEL_SELECTION)
+            
+            model_choice = input(f"Choose model (1-{len(_GPT_MODELS)}, default: 1): ").strip()
+            gpt_model = _GPT_MODEL_CHOICES.get(model_choice, _GPT_MODELS[0][0])
+        print(f"Selected model: {gpt_model}")
+    
+    # Create .env file
+    env_content = "".join((
+        _ENV_TEMPLATE_HEAD,
+        "\n".join((
+            f"USE_GPT_ANALYSIS={str(use_gpt).lower()}",
+            "",
+            "# GPT Configuration (OpenAI)",
+            f"OPENAI_API_KEY={api_key if api_key else 'your_openai_api_key_here'}",
+            f"GPT_MODEL={gpt_model if use_gpt else 'gpt-3.5-turbo'}",
+            "GPT_JSON_MODE=true",
+            "",
+        )),
+        _ENV_TEMPLATE_TAIL,
+    ))
     
     # Write .env file
     try:
-        with open(env_file, 'w') as f:
-            f.write(env_content)
-        print(f"\nConfiguration saved to {env_file}")
-        
-        if use_gpt:
-            print("\nGPT Setup Complete!")
-            print(f"   Using GPT model: {gpt_model}")
-            print(f"   API key configured")
-            print("   GPT analysis enabled")
-        else:
-            print("\nGPT Setup Skipped")
-            print("   LLaMA fallback will be used")
-            print("   Add OPENAI_API_KEY to enable GPT")
-        
-        print("\nNext Steps:")
-        print("   1. Restart the backend server")
-        print("   2. Test the analysis in the frontend")
-        print("   3. Check server status indicator")
+        # Owner-only: the file holds the API key and secret keys
+        fd = os.open(env_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            if hasattr(os, "fchmod"):
+                # The mode above only applies when the file is created
+                os.fchmod(fd, 0o600)
+            data = memoryview(env_content.encode("utf-8"))
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        sys.stdout.write("".join((
+            f"\nConfiguration saved to {env_file}\n",
+            _OK_MSG.format(gpt_model=gpt_model) if use_gpt else _SKIP_MSG,
+            _NEXT_STEPS,
+        )))
         
     except Exception as e:
         print(f"Error writing configuration: {e}")